@@ -1,23 +1,29 @@
 # get the file from ftp server and calculate the checksum
-# /ftp.ebi.ac.uk/pub/databases/opentargets/platform/24.09/release_data_integrity
-# /ftp.ebi.ac.uk/pub/databases/opentargets/platform/24.09/release_data_integrity.sha1
+# /ftp.ebi.ac.uk/pub/databases/opentargets/platform/<release>/release_data_integrity
+# /ftp.ebi.ac.uk/pub/databases/opentargets/platform/<release>/release_data_integrity.sha1
 
 import ftplib
 import hashlib
 import os
 
+from lib_utils.release_config import FTP_HOST, get_release_config
+
+RELEASE = get_release_config()
+
 # Define FTP details
-FTP_SERVER = "ftp.ebi.ac.uk"
-REMOTE_DIR = "/pub/databases/opentargets/platform/24.09/"
+FTP_SERVER = FTP_HOST
+REMOTE_DIR = RELEASE.ftp_release_dir
 FILE_NAME = "release_data_integrity"
 CHECKSUM_FILE_NAME = "release_data_integrity.sha1"
-LOCAL_FOLDER = "./data/202409XX/"
+LOCAL_FOLDER = RELEASE.data_dir
 
 
 # Local file paths
 LOCAL_FILE = os.path.join(os.getcwd(), LOCAL_FOLDER, FILE_NAME)
 LOCAL_CHECKSUM_FILE = os.path.join(os.getcwd(), LOCAL_FOLDER, CHECKSUM_FILE_NAME)
 
+os.makedirs(LOCAL_FOLDER, exist_ok=True)
+
 def download_file(ftp, remote_path, local_path):
     """Download a file from the FTP server."""
     with open(local_path, "wb") as f:
@@ -1,9 +1,11 @@
 from lib_utils.ftp_json_data_getter import download_json_files
+from lib_utils.release_config import FTP_HOST, get_release_config
+
+RELEASE = get_release_config()
 
 # FTP server details
-FTP_HOST = "ftp.ebi.ac.uk"
-FTP_DIR = "/pub/databases/opentargets/platform/24.09/output/etl/json/diseases/"
-LOCAL_DIR = "data/202409XX/diseases"  # Change this to your desired local directory
-CHECKSUM_FILE = 'data/202409XX/release_data_integrity'
+FTP_DIR = RELEASE.ftp_dir('diseases')
+LOCAL_DIR = RELEASE.local_dir('diseases')
+CHECKSUM_FILE = RELEASE.checksum_file
 
 download_json_files(FTP_HOST, FTP_DIR, LOCAL_DIR, CHECKSUM_FILE)
@@ -1,9 +1,11 @@
 from lib_utils.ftp_parquet_data_getter import download_parquet_files
+from lib_utils.release_config import FTP_HOST, get_release_config
+
+RELEASE = get_release_config()
 
 # FTP server details
-FTP_HOST = "ftp.ebi.ac.uk"
-FTP_DIR = "/pub/databases/opentargets/platform/24.09/output/etl/parquet/evidence/"
-LOCAL_DIR = "data/202409XX/evidence"  # Change this to your desired local directory
-CHECKSUM_FILE = 'data/202409XX/release_data_integrity'
+FTP_DIR = RELEASE.ftp_dir('evidence', 'parquet')
+LOCAL_DIR = RELEASE.local_dir('evidence')
+CHECKSUM_FILE = RELEASE.checksum_file
 
 download_parquet_files(FTP_HOST, FTP_DIR, LOCAL_DIR, CHECKSUM_FILE)
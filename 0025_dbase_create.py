@@ -1,7 +1,11 @@
 import duckdb
 
+from lib_utils.release_config import get_release_config
+
+RELEASE = get_release_config()
+
 # Connect to (or create) the DuckDB database
-conn = duckdb.connect("bio_data.duck.db")
+conn = duckdb.connect(RELEASE.db_path)
 
 # Create "tbl_substances" table
 conn.execute("""
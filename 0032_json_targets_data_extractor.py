@@ -2,11 +2,15 @@ import os
 import json
 import duckdb
 
+from lib_utils.release_config import get_release_config
+
+RELEASE = get_release_config()
+
 from tqdm import tqdm
 
 # Define paths
-DATA_DIR = "data/202409XX/targets"  # Change this to your actual directory path
-DUCKDB_PATH = "bio_data.duck.db"
+DATA_DIR = RELEASE.local_dir("targets")
+DUCKDB_PATH = RELEASE.db_path
 TEMP_TSV_PATH = "data_tmp/temp_data.tsv"  # Changed file extension to .tsv
 NULL = '<NULL>'  # Define NULL value "string" in temporary TSV file
 
@@ -93,8 +93,12 @@ import json
 import duckdb
 from tqdm import tqdm
 
-DATA_DIR = "data/202409XX/mechanismOfAction"
-db_path = "bio_data.duck.db"
+from lib_utils.release_config import get_release_config
+
+RELEASE = get_release_config()
+
+DATA_DIR = RELEASE.local_dir("mechanismOfAction")
+db_path = RELEASE.db_path
 
 # You can adjust this to whatever batch size suits your environment
 BATCH_SIZE = 1000
@@ -77,10 +77,14 @@ import duckdb
 import pandas as pd
 from tqdm import tqdm
 
+from lib_utils.release_config import get_release_config
+
+RELEASE = get_release_config()
+
 # Define constants
-DATA_DIR = "data/202409XX/evidence"
+DATA_DIR = RELEASE.local_dir("evidence")
 LOGS_DIR = "logs"
-DB_PATH = "bio_data.duck.db"
+DB_PATH = RELEASE.db_path
 BATCH_SIZE = 50_000  # Optimized batch size for memory efficiency
 
 # Ensure log directory exists
@@ -4,6 +4,10 @@ This script is used to get the unique types of actions from the generated interm
 
 import duckdb
 
+from lib_utils.release_config import get_release_config
+
+RELEASE = get_release_config()
+
 
 ACTION_TYPES = {
     'ACTIVATOR': 1,
@@ -38,7 +42,7 @@ ACTION_TYPES = {
     'UNIDENTIFIED': 0.0001,  # This is a placeholder for any unidentified actionType (obtained via indirect inference via DRUG->DISEASE->TARGET)
 }
 
-db_path = "bio_data.duck.db"
+db_path = RELEASE.db_path
 con = duckdb.connect(db_path)
 
 con.executemany('INSERT OR REPLACE INTO tbl_action_types VALUES (?, ?)', list(ACTION_TYPES.items()))
@@ -45,8 +45,12 @@ import json
 import duckdb
 from tqdm import tqdm
 
-DATA_DIR = "data/202409XX/molecule"
-DB_PATH = "bio_data.duck.db"
+from lib_utils.release_config import get_release_config
+
+RELEASE = get_release_config()
+
+DATA_DIR = RELEASE.local_dir("molecule")
+DB_PATH = RELEASE.db_path
 BATCH_SIZE = 1000  # Commit every 1000 insert statements
 
 con = duckdb.connect(DB_PATH)
@@ -2,9 +2,13 @@
 import duckdb
 from tqdm import tqdm
 
+from lib_utils.release_config import get_release_config
+
+RELEASE = get_release_config()
+
 
 # Connect to DuckDB
-db_path = "bio_data.duck.db"
+db_path = RELEASE.db_path
 con = duckdb.connect(db_path)
 
 molecule_ids = con.execute("SELECT id FROM tbl_molecules").fetchall()
@@ -0,0 +1,29 @@
+"""
+This script is used to create the trigram search index of the molecules, diseases and targets used by the /search endpoints
+(see lib_utils/search_index.py).
+"""
+import duckdb
+import pandas as pd
+
+from lib_utils.release_config import get_release_config
+from lib_utils.search_index import build_search_index
+
+RELEASE = get_release_config()
+
+
+time_start = pd.Timestamp.now()
+
+con = duckdb.connect(RELEASE.db_path)
+
+build_search_index(con)
+
+# Verify insertion
+con.sql("SELECT entity, field, count(*) AS documents FROM tbl_search_documents GROUP BY ALL ORDER BY ALL").show()
+print(f'{con.execute("SELECT count(*) FROM tbl_search_trigrams").fetchone()[0]} trigram postings')
+
+con.close()
+
+print("✅ Search index created in DuckDB.")
+
+time_end = pd.Timestamp.now()
+print(f"Time taken: {time_end - time_start}")
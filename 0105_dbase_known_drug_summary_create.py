@@ -0,0 +1,29 @@
+"""
+This script is used to precompute the known drug summary of every (drug, disease) pair of tbl_knownDrugsAggregated
+(max phase, best status of that phase, status rank, url availability), see lib_utils/known_drugs.py.
+"""
+import duckdb
+import pandas as pd
+
+from lib_utils.known_drugs import build_known_drug_summary
+from lib_utils.release_config import get_release_config
+
+RELEASE = get_release_config()
+
+
+time_start = pd.Timestamp.now()
+
+con = duckdb.connect(RELEASE.db_path)
+
+build_known_drug_summary(con)
+
+# Verify insertion
+con.sql("SELECT * FROM tbl_known_drug_summary LIMIT 10").show()
+print(f'{con.execute("SELECT count(*) FROM tbl_known_drug_summary").fetchone()[0]} (drug, disease) pairs')
+
+con.close()
+
+print("✅ Known drug summary created in DuckDB.")
+
+time_end = pd.Timestamp.now()
+print(f"Time taken: {time_end - time_start}")
@@ -5,6 +5,10 @@ from tqdm import tqdm
 from collections import defaultdict
 import pandas as pd
 
+from lib_utils.release_config import get_release_config
+
+RELEASE = get_release_config()
+
 
 TEMP_TSV_PATH = "data_tmp/temp_data.tsv"
 BATCH_SIZE = 10 # rows
@@ -24,7 +28,7 @@ def save_batch_to_db(con: duckdb.DuckDBPyConnection, batch: list[str]):
 
 
 # Connect to DuckDB database
-db_path = "bio_data.duck.db"
+db_path = RELEASE.db_path
 con = duckdb.connect(db_path)
 
 # Create a new table for storing molecular vectors
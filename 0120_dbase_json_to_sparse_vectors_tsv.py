@@ -66,12 +66,16 @@ import json
 from tqdm import tqdm
 import gc
 
+from lib_utils.release_config import get_release_config
+
+RELEASE = get_release_config()
+
 TEMP_TSV_PATH = "data_tmp/temp_data.tsv"
 BATCH_SIZE = 5  # rows
 NULL = '<NULL>'
 
 # Connect to DuckDB database
-db_path = "bio_data.duck.db"
+db_path = RELEASE.db_path
 con = duckdb.connect(db_path)
 
 # Fetch all unique target IDs
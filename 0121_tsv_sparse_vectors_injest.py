@@ -5,6 +5,10 @@ import duckdb
 from tqdm import tqdm
 import gc
 
+from lib_utils.release_config import get_release_config
+
+RELEASE = get_release_config()
+
 
 TEMP_TSV_PATH = "data_tmp/temp_data.tsv"
 TEMP_TSV_PATH_BATCH = "data_tmp/temp_data_batch.tsv"  # for batch insertion
@@ -12,7 +16,7 @@ BATCH_SIZE = 10 # rows
 NULL = '<NULL>'
 
 # Connect to DuckDB database and create a huge table with the molecular vectors
-db_path = "bio_data.duck.db"
+db_path = RELEASE.db_path
 con = duckdb.connect(db_path, read_only=False, config={'max_memory':'64GB'})
 
 # set memory limit
@@ -0,0 +1,107 @@
+"""
+This script is used to precompute the target-restricted norms ||v * mask|| of the molecular vectors for every disease.
+Only the molecules with a non-zero norm (i.e. sharing at least one target with the disease) are stored,
+the server then only computes the dot products of these candidates.
+Diseases that are not precomputed (see TOP_N_DISEASES) are computed by the server on first use.
+"""
+import duckdb
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+from lib_utils.release_config import get_release_config
+from lib_utils.vector_store import get_mask, get_masked_norms
+
+RELEASE = get_release_config()
+
+BATCH_SIZE = 1000  # rows read from tbl_vector_array at once
+INSERT_BATCH_SIZE = 1_000_000  # norms inserted at once
+TOP_N_DISEASES = None  # None: all diseases, otherwise only the N diseases with the most known drugs
+
+
+time_start = pd.Timestamp.now()
+
+db_path = RELEASE.db_path
+con = duckdb.connect(db_path)
+
+# Load the vector array (row order and column order as in tbl_vector_array)
+total = con.execute("SELECT count(*) FROM tbl_vector_array").fetchone()[0]
+cursor = con.execute("SELECT * FROM tbl_vector_array")
+features = [column[0] for column in cursor.description[1:]]
+feature_index = {feature: i for i, feature in enumerate(features)}
+chembl_ids = []
+matrix = np.empty((total, len(features)), dtype=np.float32)
+with tqdm(total=total, desc="Loading vectors") as pbar:
+    while True:
+        rows = cursor.fetchmany(BATCH_SIZE)
+        if not rows:
+            break
+        matrix[len(chembl_ids):len(chembl_ids) + len(rows)] = np.array([row[1:] for row in rows], dtype=np.float32)
+        chembl_ids.extend(row[0] for row in rows)
+        pbar.update(len(rows))
+chembl_ids = np.array(chembl_ids, dtype=object)
+
+if TOP_N_DISEASES is None:
+    disease_ids = [row[0] for row in con.execute("SELECT DISTINCT disease_id FROM tbl_disease_target ORDER BY 1").fetchall()]
+else:
+    disease_ids = [row[0] for row in con.execute("""
+        SELECT dt.disease_id
+        FROM (SELECT DISTINCT disease_id FROM tbl_disease_target) dt
+        JOIN tbl_knownDrugsAggregated kda ON kda.diseaseId = dt.disease_id
+        GROUP BY dt.disease_id
+        ORDER BY count(*) DESC, dt.disease_id
+        LIMIT ?
+    """, [TOP_N_DISEASES]).fetchall()]
+
+disease_targets = {}
+for disease_id, target_id in con.execute("SELECT DISTINCT disease_id, target_id FROM tbl_disease_target").fetchall():
+    disease_targets.setdefault(disease_id, []).append(target_id)
+
+con.execute("DROP TABLE IF EXISTS tbl_disease_masked_norms")
+con.execute("""
+    CREATE TABLE tbl_disease_masked_norms (
+        disease_id STRING,
+        ChEMBL_id STRING,
+        norm FLOAT
+    )
+""")
+
+def save_batch_to_db(con: duckdb.DuckDBPyConnection, batch: list[pd.DataFrame]):
+    df_batch = pd.concat(batch, ignore_index=True)
+    con.execute("INSERT INTO tbl_disease_masked_norms SELECT * FROM df_batch")
+
+batch, batch_len = [], 0
+for disease_id in tqdm(disease_ids, desc="Computing masked norms"):
+    # same column order as the mask applied by the server
+    columns = sorted(feature_index[target_id] for target_id in disease_targets.get(disease_id, []) if target_id in feature_index)
+    # only the molecules with a value in the masked columns can have a non-zero norm
+    rows = np.flatnonzero(np.any(matrix[:, columns] != 0, axis=1))
+    norms = get_masked_norms(matrix, rows, get_mask(len(features), columns))
+    rows, norms = rows[norms > 0], norms[norms > 0]
+    if not len(rows):
+        continue
+    batch.append(pd.DataFrame({'disease_id': disease_id, 'ChEMBL_id': chembl_ids[rows], 'norm': norms}))
+    batch_len += len(rows)
+    if batch_len >= INSERT_BATCH_SIZE:
+        save_batch_to_db(con, batch)
+        batch, batch_len = [], 0
+if batch:
+    save_batch_to_db(con, batch)
+
+# keep the rows of a disease together for the lookups of the server
+con.execute("CREATE TABLE tbl_disease_masked_norms_sorted AS SELECT * FROM tbl_disease_masked_norms ORDER BY disease_id, ChEMBL_id")
+con.execute("DROP TABLE tbl_disease_masked_norms")
+con.execute("ALTER TABLE tbl_disease_masked_norms_sorted RENAME TO tbl_disease_masked_norms")
+con.execute("CREATE INDEX idx_disease_masked_norms_disease_id ON tbl_disease_masked_norms (disease_id)")
+
+# Verify insertion
+con.sql("SELECT * FROM tbl_disease_masked_norms LIMIT 10").show()
+print(f'{con.execute("SELECT count(DISTINCT disease_id) FROM tbl_disease_masked_norms").fetchone()[0]} diseases')
+print(f'{con.execute("SELECT count(*) FROM tbl_disease_masked_norms").fetchone()[0]} rows')
+
+con.close()
+
+print("✅ Masked norms precomputed and stored in DuckDB.")
+
+time_end = pd.Timestamp.now()
+print(f"Time taken: {time_end - time_start}")
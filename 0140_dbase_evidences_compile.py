@@ -0,0 +1,46 @@
+"""
+This script is used to compile the evidences of the actions (molecule -> target) into one lookup table for the /evidences endpoint:
+one row per (ChEMBL_id, target_id, actionType, mechanismOfAction) with its references already grouped into a list,
+sorted and indexed on ChEMBL_id.
+"""
+import duckdb
+import pandas as pd
+
+from lib_utils.release_config import get_release_config
+
+RELEASE = get_release_config()
+
+
+time_start = pd.Timestamp.now()
+
+con = duckdb.connect(RELEASE.db_path)
+
+con.execute("DROP TABLE IF EXISTS tbl_evidences")
+# action_order keeps the order of the actions (and of their references) in the source tables
+con.execute("""
+    CREATE TABLE tbl_evidences AS
+    SELECT
+        a.ChEMBL_id,
+        a.target_id,
+        a.actionType,
+        a.mechanismOfAction,
+        list(struct_pack(ref_source := r.ref_source, ref_data := r.ref_data) ORDER BY a.rowid, r.rowid)
+            FILTER (WHERE r.ref_source IS NOT NULL AND r.ref_source <> '') AS refs,
+        min(a.rowid) AS action_order
+    FROM tbl_actions a
+    LEFT JOIN tbl_refs r ON a.action_id = r.action_id
+    GROUP BY a.ChEMBL_id, a.target_id, a.actionType, a.mechanismOfAction
+    ORDER BY a.ChEMBL_id, action_order
+""")
+con.execute("CREATE INDEX idx_evidences_chembl_id ON tbl_evidences (ChEMBL_id)")
+
+# Verify insertion
+con.sql("SELECT * FROM tbl_evidences LIMIT 10").show()
+print(f'{con.execute("SELECT count(*) FROM tbl_evidences").fetchone()[0]} evidences')
+
+con.close()
+
+print("✅ Evidences compiled in DuckDB.")
+
+time_end = pd.Timestamp.now()
+print(f"Time taken: {time_end - time_start}")
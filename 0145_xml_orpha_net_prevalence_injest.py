@@ -0,0 +1,156 @@
+"""
+This script is used to load the Orphanet prevalence of the rare diseases (en_product9_prev.xml, https://www.orphadata.com)
+into the database of the release (tbl_orphaNetDisorderList), where it can be joined with tbl_diseases
+through the Orphanet cross-references of dbXRefs (e.g. "Orphanet:558"), see 0150_dbase_disease_prevalence_create.py.
+Without XML_FILE the stage is skipped: the prevalence of the release is then left empty by 0150.
+
+The XML is read as a stream (iterparse): every Disorder element is cleared once its rows are extracted,
+so the memory use does not depend on the size of the file. The rows are inserted in batches of BATCH_SIZE.
+"""
+import os
+import sys
+import xml.etree.ElementTree as ET
+
+import duckdb
+import pandas as pd
+from tqdm import tqdm
+
+from lib_utils.release_config import get_release_config
+
+RELEASE = get_release_config()
+
+
+XML_FILE = './data_tmp/en_product9_prev.xml'
+TBL_NAME = 'tbl_orphaNetDisorderList'
+BATCH_SIZE = 10000
+
+COLUMNS = [
+    'OrphaCode',
+    'ExpertLink',
+    'Name',
+    'DisorderType',
+    'DisorderGroup',
+    'Source',
+    'PrevalenceType',
+    'PrevalenceQualification',
+    'PrevalenceClass',
+    'ValMoy',
+    'PrevalenceGeographic',
+    'PrevalenceValidationStatus',
+]
+
+
+def get_disorder_rows(disorder: ET.Element):
+    """Returns the rows of a Disorder element, one per prevalence."""
+    row0 = {}
+    prevalence_list = []
+    for field in disorder:
+        if field.tag in ('DisorderType', 'DisorderGroup'):
+            if len(field):
+                row0[field.tag] = field[0].text
+            else:
+                row0[field.tag] = ''
+        elif field.tag in ('OrphaCode', 'ExpertLink', 'Name'):
+            row0[field.tag] = field.text
+        elif field.tag == 'PrevalenceList':
+            prevalence_list = field
+        else:
+            print(f'Unknown tag: {field.tag} (Disorder {disorder.attrib})')
+            exit(1)
+
+    rows = []
+    for prevalence in prevalence_list:
+        row1 = row0.copy()
+        for field in prevalence:
+            if field.tag in ('Source', 'ValMoy'):
+                row1[field.tag] = field.text
+            elif field.tag in ('PrevalenceType', 'PrevalenceQualification', 'PrevalenceClass',
+                            'PrevalenceGeographic', 'PrevalenceValidationStatus'):
+                if len(field):
+                    row1[field.tag] = field[0].text
+                else:
+                    row1[field.tag] = ''
+            else:
+                print(f'Unknown tag: {field.tag} (Disorder {disorder.attrib}, Prevalence {prevalence.attrib})')
+                exit(1)
+        rows.append(tuple(row1.get(column) for column in COLUMNS))
+    return rows
+
+
+def insert_rows(conn: duckdb.DuckDBPyConnection, rows: list):
+    batch_df = pd.DataFrame(rows, columns=COLUMNS, dtype=object)
+    conn.execute(f"INSERT INTO {TBL_NAME} BY NAME SELECT * FROM batch_df")
+
+
+if not os.path.exists(XML_FILE):
+    print(f"⚠️ {XML_FILE} not found (download it from https://www.orphadata.com), Orphanet prevalence not loaded")
+    sys.exit(0)
+
+time_start = pd.Timestamp.now()
+
+conn = duckdb.connect(RELEASE.db_path)
+
+conn.execute(f'DROP TABLE IF EXISTS {TBL_NAME}')
+conn.execute(f"""
+CREATE TABLE IF NOT EXISTS {TBL_NAME} (
+    OrphaCode STRING,
+    ExpertLink STRING,
+    Name STRING,
+    DisorderType STRING,
+    DisorderGroup STRING,
+    Source STRING,
+    PrevalenceType STRING,
+    PrevalenceQualification STRING,
+    PrevalenceClass STRING,
+    ValMoy STRING,
+    PrevalenceGeographic STRING,
+    PrevalenceValidationStatus STRING,
+);
+""")
+
+# JDBOR > DisorderList > Disorder
+path = []
+disorder_list = None
+batch = []
+n_rows = 0
+with tqdm(desc='Disorders', unit=' disorders') as pbar:
+    for event, elem in ET.iterparse(XML_FILE, events=('start', 'end')):
+        if event == 'start':
+            path.append(elem.tag)
+            if path[1:] == ['DisorderList']:
+                disorder_list = elem
+            continue
+        path.pop()
+        if elem.tag == 'Disorder' and path[1:] == ['DisorderList']:
+            batch.extend(get_disorder_rows(elem))
+            # the processed disorders are dropped from the tree
+            elem.clear()
+            disorder_list.remove(elem)
+            pbar.update(1)
+            if len(batch) >= BATCH_SIZE:
+                insert_rows(conn, batch)
+                n_rows += len(batch)
+                batch = []
+if batch:
+    insert_rows(conn, batch)
+    n_rows += len(batch)
+assert disorder_list is not None, 'DisorderList not found'
+
+
+conn.sql(f"SELECT * FROM {TBL_NAME} LIMIT 10").show()
+print(n_rows, 'rows')
+# diseases of the release with an Orphanet cross-reference found in the prevalence data
+if conn.execute("SELECT count(*) FROM information_schema.tables WHERE table_name = 'tbl_diseases'").fetchone()[0]:
+    n_diseases = conn.execute(f"""
+        SELECT count(DISTINCT d.id)
+        FROM (SELECT id, unnest(dbXRefs) AS xref FROM tbl_diseases) d
+        JOIN {TBL_NAME} o ON d.xref = 'Orphanet:' || o.OrphaCode
+    """).fetchone()[0]
+    print(n_diseases, 'diseases of tbl_diseases with Orphanet prevalence data')
+
+conn.close()
+
+print(f"✅ Data successfully written to DuckDB ({RELEASE.db_path})")
+
+time_end = pd.Timestamp.now()
+print(f"Time taken: {time_end - time_start}")
@@ -0,0 +1,137 @@
+"""
+This script is used to join the diseases with the Orphanet prevalence data (tbl_orphaNetDisorderList, see 0145_xml_orpha_net_prevalence_injest.py):
+
+tbl_disease_orpha_code: (disease_id, orpha_code) of the Orphanet cross-references of tbl_diseases.dbXRefs
+                        (e.g. "Orphanet:558") and of the Orphanet diseases themselves (e.g. Orphanet_558)
+tbl_disease_prevalence: point prevalence (per 100 000) and global patient population of every disease with Orphanet data
+
+The prevalence of a row is its mean value (ValMoy) or, if there is none, the middle of its prevalence class
+(e.g. "1-5 / 10 000" -> 30 per 100 000). The prevalence of an Orphanet disorder is its worldwide one if known,
+else the mean of the regional ones; the prevalence of a disease is the highest one of its Orphanet disorders.
+The Orphanet data of the release is used, or else the one of ORPHA_DB_FILE (written by the former parse_orpha_net_xml.py);
+without Orphanet data, tbl_disease_prevalence is created empty.
+"""
+import os
+import re
+
+import duckdb
+import pandas as pd
+
+from lib_utils.ivpe_scoring import WORLD_POPULATION
+from lib_utils.release_config import get_release_config
+
+RELEASE = get_release_config()
+
+ORPHA_TBL_NAME = 'tbl_orphaNetDisorderList'
+ORPHA_DB_FILE = 'orpha.net.duck.db'
+# e.g. "1-9 / 100 000", "<1 / 1 000 000", ">1 / 1000"
+PREVALENCE_CLASS_PATTERN = re.compile(r'^([<>])?\s*(\d+)(?:\s*-\s*(\d+))?\s*/\s*([\d ]+)$')
+
+
+def parse_prevalence_class(prevalence_class: str):
+    """Returns the prevalence of a class per 100 000 (middle of the range, half of a "<" bound, a ">" bound), None if unknown."""
+    match = PREVALENCE_CLASS_PATTERN.match((prevalence_class or '').strip())
+    if match is None:
+        return None
+    bound, low, high, denominator = match.groups()
+    low, denominator = float(low), float(denominator.replace(' ', ''))
+    if bound == '<':
+        value = low / 2
+    elif high is not None:
+        value = (low + float(high)) / 2
+    else:
+        value = low
+    return value * 100000 / denominator
+
+
+time_start = pd.Timestamp.now()
+
+con = duckdb.connect(RELEASE.db_path)
+
+con.execute("DROP TABLE IF EXISTS tbl_disease_orpha_code")
+con.execute(r"""
+    CREATE TABLE tbl_disease_orpha_code AS
+    SELECT DISTINCT disease_id, orpha_code
+    FROM (
+        SELECT id AS disease_id, regexp_extract(xref, '^Orphanet[:_](\d+)$', 1) AS orpha_code
+        FROM (SELECT id, unnest(dbXRefs) AS xref FROM tbl_diseases)
+        UNION ALL
+        SELECT id, regexp_extract(id, '^Orphanet_(\d+)$', 1) FROM tbl_diseases
+    )
+    WHERE orpha_code != ''
+    ORDER BY disease_id, orpha_code
+""")
+con.execute("CREATE INDEX idx_disease_orpha_code_disease_id ON tbl_disease_orpha_code (disease_id)")
+con.execute("CREATE INDEX idx_disease_orpha_code_orpha_code ON tbl_disease_orpha_code (orpha_code)")
+
+con.execute("DROP TABLE IF EXISTS tbl_disease_prevalence")
+con.execute("""
+    CREATE TABLE tbl_disease_prevalence (
+        disease_id STRING,
+        orpha_code STRING,          -- Orphanet disorder the prevalence comes from
+        prevalence DOUBLE,          -- point prevalence per 100 000
+        population BIGINT,          -- global patient population
+        is_worldwide BOOLEAN,       -- worldwide prevalence, else mean of the regional ones
+    )
+""")
+
+tables = {row[0] for row in con.execute("SELECT table_name FROM information_schema.tables").fetchall()}
+orpha_table = None
+if ORPHA_TBL_NAME in tables:
+    orpha_table = ORPHA_TBL_NAME
+elif os.path.exists(ORPHA_DB_FILE):
+    con.execute(f"ATTACH '{ORPHA_DB_FILE}' AS orpha (READ_ONLY)")
+    orpha_table = f"orpha.{ORPHA_TBL_NAME}"
+    print(f"Orphanet prevalence data of {ORPHA_DB_FILE}")
+
+if orpha_table is not None:
+    # the few distinct prevalence classes are parsed here, the rows are joined with them in the database
+    classes = [row[0] for row in con.execute(f"SELECT DISTINCT PrevalenceClass FROM {orpha_table}").fetchall()]
+    df_classes = pd.DataFrame({'PrevalenceClass': classes, 'class_prevalence': [parse_prevalence_class(c) for c in classes]})
+
+    con.execute(f"""
+        INSERT INTO tbl_disease_prevalence
+        WITH row_prevalences AS (
+            SELECT
+                o.OrphaCode AS orpha_code,
+                o.PrevalenceGeographic = 'Worldwide' AS is_worldwide,
+                coalesce(nullif(TRY_CAST(o.ValMoy AS DOUBLE), 0), c.class_prevalence) AS prevalence
+            FROM {orpha_table} o
+            LEFT JOIN df_classes c USING (PrevalenceClass)
+            WHERE o.PrevalenceType = 'Point prevalence'
+        ), orpha_prevalences AS (
+            SELECT
+                orpha_code,
+                coalesce(avg(prevalence) FILTER (WHERE is_worldwide), avg(prevalence)) AS prevalence,
+                bool_or(is_worldwide) AS is_worldwide
+            FROM row_prevalences
+            WHERE prevalence > 0
+            GROUP BY orpha_code
+        )
+        SELECT
+            dc.disease_id,
+            arg_max(dc.orpha_code, op.prevalence),
+            max(op.prevalence),
+            round(max(op.prevalence) / 100000 * {WORLD_POPULATION})::BIGINT,
+            arg_max(op.is_worldwide, op.prevalence)
+        FROM tbl_disease_orpha_code dc
+        JOIN orpha_prevalences op USING (orpha_code)
+        GROUP BY dc.disease_id
+        ORDER BY dc.disease_id
+    """)
+else:
+    print(f"⚠️ No Orphanet prevalence data ({ORPHA_TBL_NAME}), run 0145_xml_orpha_net_prevalence_injest.py")
+con.execute("CREATE INDEX idx_disease_prevalence_disease_id ON tbl_disease_prevalence (disease_id)")
+
+# Verify insertion
+con.sql("SELECT * FROM tbl_disease_orpha_code LIMIT 10").show()
+con.sql("SELECT * FROM tbl_disease_prevalence LIMIT 10").show()
+print(f'{con.execute("SELECT count(DISTINCT disease_id) FROM tbl_disease_orpha_code").fetchone()[0]} diseases with an Orphanet code')
+print(f'{con.execute("SELECT count(*) FROM tbl_disease_prevalence").fetchone()[0]} diseases with a prevalence')
+
+con.close()
+
+print("✅ Disease prevalence created in DuckDB.")
+
+time_end = pd.Timestamp.now()
+print(f"Time taken: {time_end - time_start}")
@@ -0,0 +1,89 @@
+"""
+This script is used to materialise the disease ontology (tbl_diseases.parents) for the descendant-aware queries
+(include_descendants=true of /disease_targets and /disease_chembl_similarity):
+
+tbl_disease_closure:            (ancestor_id, descendant_id, depth) for every disease and each of its descendants,
+                                depth = length of the shortest path (0: the disease itself)
+tbl_disease_descendant_target:  (disease_id, target_id), union of the targets of the disease and of all its descendants
+
+The closure is built level by level: the pairs of depth d + 1 are the children of the descendants of depth d
+that are not already in the closure, so every pair is found once, with its shortest depth, whatever the number of paths.
+"""
+import duckdb
+import pandas as pd
+
+from lib_utils.release_config import get_release_config
+
+RELEASE = get_release_config()
+
+
+time_start = pd.Timestamp.now()
+
+con = duckdb.connect(RELEASE.db_path)
+
+con.execute("""
+    CREATE TEMP TABLE tmp_disease_edges AS
+    SELECT DISTINCT parent_id, child_id
+    FROM (SELECT unnest(parents) AS parent_id, id AS child_id FROM tbl_diseases)
+    WHERE parent_id IN (SELECT id FROM tbl_diseases) AND parent_id != child_id
+""")
+
+con.execute("DROP TABLE IF EXISTS tbl_disease_closure")
+con.execute("""
+    CREATE TABLE tbl_disease_closure AS
+    SELECT id AS ancestor_id, id AS descendant_id, 0 AS depth FROM tbl_diseases
+""")
+depth = 0
+while True:
+    n_pairs = con.execute(f"""
+        INSERT INTO tbl_disease_closure
+        SELECT DISTINCT c.ancestor_id, e.child_id, {depth + 1}
+        FROM tbl_disease_closure c
+        JOIN tmp_disease_edges e ON e.parent_id = c.descendant_id
+        WHERE c.depth = {depth}
+          AND NOT EXISTS (
+              SELECT 1 FROM tbl_disease_closure x WHERE x.ancestor_id = c.ancestor_id AND x.descendant_id = e.child_id
+          )
+    """).fetchone()[0]
+    if not n_pairs:
+        break
+    depth += 1
+    print(f"depth {depth}: {n_pairs} pairs")
+
+# keep the descendants of a disease together
+con.execute("CREATE TABLE tbl_disease_closure_sorted AS SELECT * FROM tbl_disease_closure ORDER BY ancestor_id, depth, descendant_id")
+con.execute("DROP TABLE tbl_disease_closure")
+con.execute("ALTER TABLE tbl_disease_closure_sorted RENAME TO tbl_disease_closure")
+con.execute("CREATE INDEX idx_disease_closure_ancestor_id ON tbl_disease_closure (ancestor_id)")
+con.execute("CREATE INDEX idx_disease_closure_descendant_id ON tbl_disease_closure (descendant_id)")
+
+con.execute("DROP TABLE IF EXISTS tbl_disease_descendant_target")
+con.execute("""
+    CREATE TABLE tbl_disease_descendant_target AS
+    SELECT DISTINCT c.ancestor_id AS disease_id, dt.target_id
+    FROM tbl_disease_closure c
+    JOIN tbl_disease_target dt ON dt.disease_id = c.descendant_id
+    ORDER BY disease_id, target_id
+""")
+con.execute("CREATE INDEX idx_disease_descendant_target_disease_id ON tbl_disease_descendant_target (disease_id)")
+
+# Verify insertion
+con.sql("SELECT * FROM tbl_disease_closure WHERE depth > 0 LIMIT 10").show()
+con.sql("SELECT depth, count(*) AS pairs FROM tbl_disease_closure GROUP BY depth ORDER BY depth").show()
+print(f'{con.execute("SELECT count(*) FROM tbl_disease_closure WHERE depth > 0").fetchone()[0]} (ancestor, descendant) pairs')
+# the closure of the parents must contain the ancestors listed by the ontology
+n_missing = con.execute("""
+    SELECT count(*) FROM (SELECT unnest(ancestors) AS ancestor_id, id AS descendant_id FROM tbl_diseases) a
+    ANTI JOIN tbl_disease_closure c USING (ancestor_id, descendant_id)
+    WHERE a.ancestor_id IN (SELECT id FROM tbl_diseases)
+""").fetchone()[0]
+print(f'{n_missing} ancestors of tbl_diseases.ancestors not reached from the parents')
+print(f'{con.execute("SELECT count(*) FROM tbl_disease_descendant_target").fetchone()[0]} (disease, target) pairs including the descendants, '
+      f'{con.execute("SELECT count(*) FROM (SELECT DISTINCT disease_id, target_id FROM tbl_disease_target)").fetchone()[0]} without')
+
+con.close()
+
+print("✅ Disease closure created in DuckDB.")
+
+time_end = pd.Timestamp.now()
+print(f"Time taken: {time_end - time_start}")
@@ -4,8 +4,12 @@ This script is used to check whether manual intervention is required for the act
 
 import duckdb
 
+from lib_utils.release_config import get_release_config
 
-db_path = "bio_data.duck.db"
+RELEASE = get_release_config()
+
+
+db_path = RELEASE.db_path
 con = duckdb.connect(db_path)
 
 # check if new actionType was added
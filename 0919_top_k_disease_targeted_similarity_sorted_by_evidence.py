@@ -4,26 +4,19 @@ import numpy as np
 import pandas as pd
 from tqdm import tqdm
 
+from lib_utils.known_drugs import NO_KNOWN_DRUG_SUMMARY, summarize_known_drugs
+from lib_utils.release_config import get_active_db_path
+from lib_utils.vector_store import open_vector_store
+
 JSON_CHARS_TO_DISPLAY = 100
 
 TOP_K = 25
 
-STATUS_NUM = {
-    'Active, not recruiting': 4,
-    'Completed': 5,
-    'Enrolling by invitation': 3,
-    'Not yet recruiting': 1,
-    'Recruiting': 2,
-    'Suspended': 0,
-    'Terminated': 0,
-    'Unknown status': 0,
-    'Withdrawn': 0,
-    'N/A': 0,
-}
-
 # Connect to DuckDB database
-db_path = "bio_data.duck.db"
+db_path = get_active_db_path()
+store = open_vector_store(db_path)  # built first if missing or stale, before the database is opened for writing
 con = duckdb.connect(db_path)
+tables = {row[0] for row in con.execute("SELECT table_name FROM information_schema.tables").fetchall()}
 
 # ---------------------- DISEASE SELECTION ----------------------
 user_input = input("Enter the disease ID, name, or description: ").strip()
@@ -120,13 +113,16 @@ vec_ref_norm = np.linalg.norm(vec_ref)
 np.set_printoptions(threshold=np.inf)
 print(mask)
 
-total = con.execute("SELECT count(*) FROM tbl_vector_array").fetchone()[0]
-all_vectors = con.execute("SELECT * FROM tbl_vector_array")
+# Only the molecules hitting a disease target that the reference also hits can be similar:
+# the union of the postings of these targets (inverted index of the vector store, see lib_utils/vector_store.py) is the exact candidate set
+hit_columns = [store.feature_index[feature] for feature, value in zip(vector_features, vec_ref) if value != 0]
+candidate_rows = store.get_candidate_rows(hit_columns)
+print(f"{len(candidate_rows)} candidate compound(s) share a target with the reference compound.")
 
 similarities = []
-for _ in tqdm(range(total), desc="Calculating similarities"):
-    chembl_id, *vector = all_vectors.fetchone()
-    vec = np.array(vector, dtype=np.float32) * mask  # Apply mask to each vector
+for row in tqdm(candidate_rows, desc="Calculating similarities"):
+    chembl_id = str(store.chembl_ids[row])
+    vec = np.array(store.matrix[row], dtype=np.float32) * mask  # Apply mask to each vector
     norm_product = vec_ref_norm * np.linalg.norm(vec)
     
     similarity = np.dot(vec_ref, vec) / (norm_product + 0) if norm_product > 0 else 0  # Avoid division by zero
@@ -160,19 +156,14 @@ for index, row in tqdm(df_results.iterrows(), total=len(df_results), desc="Fetch
 
     query = "SELECT * FROM tbl_knownDrugsAggregated WHERE drugId = ? and diseaseId = ?"
     known_drugs_aggregated = [{column[0]: value for column, value in zip(con.description, row)} for row in con.execute(query, [chembl_id, disease_id]).fetchall()]
-    if known_drugs_aggregated:
-        is_url_available = any(row['urls'] for row in known_drugs_aggregated)
-        max_phase = max(row['phase'] for row in known_drugs_aggregated)
-        max_status_for_max_phase = max((row['status'] for row in known_drugs_aggregated if row['phase'] == max_phase), key=lambda x: STATUS_NUM.get(x, 0))
-        if max_status_for_max_phase is None:
-            max_status_for_max_phase = 'N/A'
-        status_num = STATUS_NUM[max_status_for_max_phase]
+
+    # max phase, best status of that phase and url availability, precomputed by 0105 if it has been run
+    if "tbl_known_drug_summary" in tables:
+        query = "SELECT max_phase, best_status, status_num, has_urls FROM tbl_known_drug_summary WHERE diseaseId = ? and drugId = ?"
+        summary = con.execute(query, [disease_id, chembl_id]).fetchone()
+        max_phase, max_status_for_max_phase, status_num, is_url_available = summary or NO_KNOWN_DRUG_SUMMARY
     else:
-        known_drugs_aggregated = []
-        is_url_available = False
-        max_phase = 0
-        max_status_for_max_phase = 'N/A'
-        status_num = 0
+        max_phase, max_status_for_max_phase, status_num, is_url_available = summarize_known_drugs(known_drugs_aggregated)
 
     known_drugs_aggregated_column.append(known_drugs_aggregated)
     is_url_available_column.append(is_url_available)
@@ -0,0 +1,32 @@
+"""
+This script is used to query the similarity scoring of the server from the command line, without the server
+(see lib_utils/similarity_service.py). The output is the JSON response of the endpoint.
+
+python 0921_disease_chembl_similarity_getter.py EFO_0009854 CHEMBL395091           # /disease_chembl_similarity, top 10
+python 0921_disease_chembl_similarity_getter.py EFO_0009854 CHEMBL395091 25        # top 25
+python 0921_disease_chembl_similarity_getter.py EFO_0009854 CHEMBL395091 CHEMBL742 # /evidences
+"""
+import sys
+import json
+
+from lib_utils.release_config import get_active_db_path
+from lib_utils.similarity_service import NotFoundError, SimilarityService
+
+
+if len(sys.argv) not in (3, 4):
+    print(__doc__)
+    sys.exit(2)
+
+disease_id, chembl_id = sys.argv[1:3]
+service = SimilarityService(get_active_db_path(), pool_size=1)
+try:
+    if len(sys.argv) == 4 and not sys.argv[3].isdigit():
+        result = service.evidences(disease_id, chembl_id, sys.argv[3])
+    else:
+        top_k = int(sys.argv[3]) if len(sys.argv) == 4 else 10
+        result = service.disease_chembl_similarity(disease_id, chembl_id, top_k)
+except NotFoundError as e:
+    print(f"❌ {e}")
+    sys.exit(1)
+
+print(json.dumps(result, indent=2, ensure_ascii=False))
@@ -1,35 +1,143 @@
 import os
 import json
-from fastapi import FastAPI, Query, HTTPException
+import threading
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Query, HTTPException, Depends, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
 import duckdb
-import numpy as np
 from typing import List, Dict
 
+from lib_utils.autocomplete import ENTITY_TYPES, AutocompleteIndex
+from lib_utils.fast_json import FastJSONResponse
+from lib_utils.ivpe_table import SORT_COLUMNS as IVPE_SORT_COLUMNS, IvpeTable
+from lib_utils.metrics import METRICS_ENABLED, install_metrics, instrument_cursor, render_metrics
+from lib_utils.release_config import ACTIVE_RELEASE_FILE, get_active_db_path, get_db_fingerprint, get_release_config
+from lib_utils.response_streaming import NDJSON_MEDIA_TYPE, get_stream_media_type, streaming_response, to_ndjson_line
+from lib_utils.result_cache import ResultCache
+from lib_utils.search_index import SEARCH_ENTITIES, InvalidCursorError, search_ids
+from lib_utils.similarity_service import NotFoundError, SimilarityService
+from lib_utils.warmup import warm_up
+
 
 
 TABLE_IVPE_DIR = 'staging_area_03'
-STATUS_NUM = {
-    'Active, not recruiting': 4,
-    'Completed': 5,
-    'Enrolling by invitation': 3,
-    'Not yet recruiting': 1,
-    'Recruiting': 2,
-    'Suspended': 0,
-    'Terminated': 0,
-    'Unknown status': 0,
-    'Withdrawn': 0,
-    'N/A': 0,
-}
+TABLE_IVPE_RANKED_DIR = 'staging_area_04'  # written by 6060_score_IVPE_table_candidates.py
+
+# Columns of the streamed /disease_chembl_similarity rows (Arrow type aliases)
+SIMILARITY_STREAM_FIELDS = [
+    ("section", "string"),
+    ("ChEMBL ID", "string"),
+    ("Similarity", "double"),
+    ("Molecule Name", "string"),
+    ("isUrlAvailable", "bool"),
+    ("isApproved", "bool"),
+    ("phase", "double"),
+    ("status", "string"),
+    ("status_num", "int64"),
+    ("fld_knownDrugsAggregated", "string"),
+]
+
+def run_warm_up():
+    """Pre-loads the vectors, the indices and the hot tables, then marks the server as ready (see /health/ready)."""
+    global warm_up_timings
+    time_start = time.perf_counter()
+    service = get_service()
+    with service.pool.cursor() as cur:
+        warm_up_timings = warm_up(service.store, cur)
+    warm_up_timings["total"] = round(time.perf_counter() - time_start, 3)
+    print(f"✅ Warm-up done in {warm_up_timings['total']:.1f}s: {warm_up_timings}", flush=True)
+    server_ready.set()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # the warm-up runs in the background, the server answers /health/ready with 503 until it is done
+    threading.Thread(target=run_warm_up, name="warm-up", daemon=True).start()
+    yield
 
 # Initialize FastAPI app
-app = FastAPI(title="Affordable API", description="API for querying molecular similarity and target data", version="1.0")
-
-# Connect to DuckDB
-db_path = "bio_data.duck.db"
-conn = duckdb.connect(db_path)
+# The large responses are returned as FastJSONResponse (see lib_utils/fast_json.py) to skip the default encoding
+app = FastAPI(title="Affordable API", description="API for querying molecular similarity and target data", version="1.0",
+              default_response_class=FastJSONResponse, lifespan=lifespan)
+# Server-Timing header and /metrics, only with AFFORDABLE_METRICS=1 (see lib_utils/metrics.py)
+install_metrics(app)
+
+# Connect to DuckDB (database of the active release, see lib_utils/release_config.py).
+# The scoring of /disease_chembl_similarity and /evidences is done by the SimilarityService of the release
+# (see lib_utils/similarity_service.py): the database is opened read-only, every request borrows its own cursor
+# from the pool of the service, the vectors are served from a memory-mapped store shared by all server processes.
+RELEASE = get_release_config()
+# Cache of /disease_chembl_similarity responses (size and TTL: AFFORDABLE_CACHE_SIZE, AFFORDABLE_CACHE_TTL),
+# shared by the services of all releases (the database fingerprint is part of the keys)
+similarity_cache = ResultCache()
+service = SimilarityService(get_active_db_path(RELEASE), result_cache=similarity_cache)
+# Prefix index of the molecule and disease names for /autocomplete (see lib_utils/autocomplete.py), built at startup
+with service.pool.cursor() as _cur:
+    autocomplete_index = AutocompleteIndex.from_db(_cur)
+
+# IVPE table, parsed once and reloaded when the files of TABLE_IVPE_DIR change
+table_ivpe = IvpeTable(TABLE_IVPE_DIR)
+table_ivpe_ranked = IvpeTable(TABLE_IVPE_RANKED_DIR)
+
+_tables = {}  # (db fingerprint, table name) -> columns of the table
+
+server_ready = threading.Event()
+warm_up_timings = None
+
+_release_lock = threading.Lock()
+_release_mtime = os.stat(ACTIVE_RELEASE_FILE).st_mtime_ns if os.path.exists(ACTIVE_RELEASE_FILE) else None
+
+
+def get_service():
+    """Returns the service of the active release, reopening it once another release or a rebuild of the release has been activated."""
+    global service, autocomplete_index, _release_mtime
+    try:
+        mtime = os.stat(ACTIVE_RELEASE_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return service
+    if mtime != _release_mtime:
+        with _release_lock:
+            if mtime != _release_mtime:
+                db_path = get_active_db_path(RELEASE)
+                # a rebuilt release has the same path but another fingerprint, the old file was renamed
+                if get_db_fingerprint(db_path) != service.fingerprint:
+                    # requests in progress keep their cursors of the old pool until they finish
+                    new_service = SimilarityService(db_path, service.pool.size, result_cache=similarity_cache)
+                    with new_service.pool.cursor() as cur:
+                        autocomplete_index = AutocompleteIndex.from_db(cur)
+                    service = new_service
+                _release_mtime = mtime
+    return service
+
+
+def get_cursor():
+    """Request-scoped cursor of the active release."""
+    with get_service().pool.cursor() as cur:
+        yield instrument_cursor(cur) if METRICS_ENABLED else cur
+
+
+@app.exception_handler(NotFoundError)
+def not_found_handler(request: Request, exc: NotFoundError):
+    return JSONResponse({"detail": str(exc)}, status_code=404)
+
+
+@app.get("/health/ready", response_model=Dict)
+def get_readiness():
+    """200 once the warm-up is done, 503 before."""
+    if not server_ready.is_set():
+        return JSONResponse({"ready": False}, status_code=503)
+    return {"ready": True, "warm_up": warm_up_timings}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus metrics of this server process (enabled with AFFORDABLE_METRICS=1)."""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled, set AFFORDABLE_METRICS=1")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
 @app.get("/molecules/{chembl_id}", response_model=Dict)
-def get_molecule(chembl_id: str):
+def get_molecule(chembl_id: str, conn: duckdb.DuckDBPyConnection = Depends(get_cursor)):
     """Retrieve details of a molecule by its ChEMBL ID."""
     query = """
         SELECT * FROM tbl_molecules WHERE id = ?
@@ -41,7 +149,7 @@ def get_molecule(chembl_id: str):
     return dict(zip(columns, result))
 
 @app.get("/similarity/{chembl_id}", response_model=List[Dict])
-def get_similarity(chembl_id: str, top_k: int = Query(10, ge=1, le=100)):
+def get_similarity(chembl_id: str, top_k: int = Query(10, ge=1, le=100), conn: duckdb.DuckDBPyConnection = Depends(get_cursor)):
     """Retrieve the top-k most similar molecules based on similarity matrix."""
     query = f"""
         SELECT * FROM tbl_similarity_matrix WHERE ChEMBL_id = ?
@@ -58,7 +166,7 @@ def get_similarity(chembl_id: str, top_k: int = Query(10, ge=1, le=100)):
     return [{"ChEMBL_id": chembl_id, "Similarity": sim} for chembl_id, sim in top_similar]
 
 @app.get("/targets/{target_id}", response_model=Dict)
-def get_target(target_id: str):
+def get_target(target_id: str, conn: duckdb.DuckDBPyConnection = Depends(get_cursor)):
     """Retrieve details of a target by its ID."""
     query = """
         SELECT * FROM tbl_targets WHERE target_id = ?
@@ -70,7 +178,7 @@ def get_target(target_id: str):
     return dict(zip(columns, result))
 
 @app.get("/diseases/{disease_id}", response_model=Dict)
-def get_disease(disease_id: str):
+def get_disease(disease_id: str, conn: duckdb.DuckDBPyConnection = Depends(get_cursor)):
     """Retrieve details of a disease by its ID."""
     query = """
         SELECT * FROM tbl_diseases WHERE id = ?
@@ -82,202 +190,183 @@ def get_disease(disease_id: str):
     return dict(zip(columns, result))
 
 @app.get("/disease_targets/{disease_id}", response_model=List[Dict])
-def get_disease_targets(disease_id: str):
+def get_disease_targets(disease_id: str, include_descendants: bool = Query(False, description="also the targets of all the subtypes of the disease"),
+                        conn: duckdb.DuckDBPyConnection = Depends(get_cursor)):
     """Retrieve all targets associated with a given disease."""
-    query = """
-        SELECT t.target_id, t.target_approvedName FROM tbl_disease_target dt
-        JOIN tbl_targets t ON dt.target_id = t.id WHERE dt.disease_id = ?
-    """
-    results = conn.execute(query, [disease_id]).fetchall()
+    if not include_descendants:
+        query = """
+            SELECT t.id AS target_id, t.approvedName AS target_approvedName FROM tbl_disease_target dt
+            JOIN tbl_targets t ON dt.target_id = t.id WHERE dt.disease_id = ?
+        """
+        params = [disease_id]
+    elif get_service().has_table(conn, "tbl_disease_descendant_target"):
+        # union over the descendants precomputed by 0160
+        query = """
+            SELECT t.id AS target_id, t.approvedName AS target_approvedName FROM tbl_disease_descendant_target dt
+            JOIN tbl_targets t ON dt.target_id = t.id WHERE dt.disease_id = ?
+            ORDER BY dt.target_id
+        """
+        params = [disease_id]
+    else:
+        query = """
+            SELECT t.id AS target_id, t.approvedName AS target_approvedName FROM tbl_targets t
+            WHERE t.id IN (
+                SELECT target_id FROM tbl_disease_target
+                WHERE disease_id = ? OR disease_id IN (SELECT unnest(descendants) FROM tbl_diseases WHERE id = ?)
+            )
+            ORDER BY t.id
+        """
+        params = [disease_id, disease_id]
+    results = conn.execute(query, params).fetchall()
     if not results:
         raise HTTPException(status_code=404, detail="No targets found for this disease")
     columns = [desc[0] for desc in conn.description]
     return [dict(zip(columns, row)) for row in results]
 
+@app.get("/disease_prevalence/{disease_id}", response_model=Dict)
+def get_disease_prevalence(disease_id: str, conn: duckdb.DuckDBPyConnection = Depends(get_cursor)):
+    """Orphanet point prevalence (per 100 000) and global patient population of a disease (see 0150)."""
+    prevalence = get_service().disease_prevalences([disease_id], conn).get(disease_id)
+    if prevalence is None:
+        raise HTTPException(status_code=404, detail="No prevalence found for this disease")
+    return {'disease_id': disease_id, **prevalence}
+
+@app.get("/autocomplete", response_model=List[Dict])
+def autocomplete(q: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=100),
+                 entity_type: str = Query(None, alias="type", pattern=f"^({'|'.join(ENTITY_TYPES)})$")):
+    """Molecules and diseases with a name, trade name or synonym starting with q, approved and later phase first."""
+    get_service()  # switches the index with the release
+    return FastJSONResponse(autocomplete_index.complete(q, limit, entity_type))
+
+def get_table_columns(conn: duckdb.DuckDBPyConnection, table_name: str):
+    fingerprint = get_service().fingerprint
+    if (fingerprint, table_name) not in _tables:
+        _tables[(fingerprint, table_name)] = [row[0] for row in conn.execute(f"DESCRIBE {table_name}").fetchall()]
+    return _tables[(fingerprint, table_name)]
+
+
+def search_entities(conn: duckdb.DuckDBPyConnection, entity: str, query: str, limit: int, after: str, fields: str):
+    """Rows of the entities matching the query, ranked (see lib_utils/search_index.py), projected on the requested fields."""
+    table = SEARCH_ENTITIES[entity][0]
+    columns = get_table_columns(conn, table)
+    if fields:
+        fields = list(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+        unknown = [field for field in fields if field not in columns]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}. Available fields: {', '.join(columns)}")
+        columns = fields
+
+    # without the index of 0101 the same search runs as a scan of the source table
+    try:
+        ids = search_ids(conn, entity, query, limit, after, indexed=get_service().has_table(conn, "tbl_search_trigrams"))
+    except InvalidCursorError as e:
+        # an empty page would look like the end of the results
+        raise HTTPException(status_code=400, detail=str(e))
+    projection = ", ".join(f't."{column}"' for column in columns)
+    results = conn.execute(f"""
+        SELECT {projection}
+        FROM {table} t
+        JOIN (SELECT unnest(?::STRING[]) AS id, unnest(range(?)) AS rank) r ON t.id = r.id
+        ORDER BY r.rank
+    """, [ids, len(ids)]).fetchall()
+    return [dict(zip(columns, row)) for row in results]
+
 @app.get("/search/molecules", response_model=List[Dict])
-def search_molecules(query: str):
-    """Search for molecules by partial name or tradename."""
-    query_str = """
-        SELECT * FROM tbl_molecules 
-        WHERE name ILIKE ? OR ? = ANY(tradeNames)
-    """
-    results = conn.execute(query_str, [f"%{query}%", query]).fetchall()
-    return [dict(zip([desc[0] for desc in conn.description], row)) for row in results]
+def search_molecules(query: str, limit: int = Query(50, ge=1, le=1000), after: str = Query(None, description="id of the last row of the previous page"),
+                    fields: str = Query(None, description="comma-separated columns to return, e.g. id,name,tradeNames"), conn: duckdb.DuckDBPyConnection = Depends(get_cursor)):
+    """Search for molecules by partial name, tradename or synonym, best matches first."""
+    return FastJSONResponse(search_entities(conn, "molecule", query, limit, after, fields))
 
 @app.get("/search/diseases", response_model=List[Dict])
-def search_diseases(query: str):
-    """Search for diseases by name or description."""
-    query_str = """
-        SELECT * FROM tbl_diseases 
-        WHERE name ILIKE ? OR description ILIKE ?
-    """
-    results = conn.execute(query_str, [f"%{query}%", f"%{query}%"]).fetchall()
-    return [dict(zip([desc[0] for desc in conn.description], row)) for row in results]
+def search_diseases(query: str, limit: int = Query(50, ge=1, le=1000), after: str = Query(None, description="id of the last row of the previous page"),
+                    fields: str = Query(None, description="comma-separated columns to return, e.g. id,name,therapeuticAreas"), conn: duckdb.DuckDBPyConnection = Depends(get_cursor)):
+    """Search for diseases by name or description, best matches first."""
+    return FastJSONResponse(search_entities(conn, "disease", query, limit, after, fields))
 
 @app.get("/search/targets", response_model=List[Dict])
-def search_targets(query: str):
-    """Search for targets by name or description."""
-    query_str = """
-        SELECT * FROM tbl_targets 
-        WHERE target_approvedName ILIKE ?
-    """
-    results = conn.execute(query_str, [f"%{query}%"]).fetchall()
-    return [dict(zip([desc[0] for desc in conn.description], row)) for row in results]
+def search_targets(query: str, limit: int = Query(50, ge=1, le=1000), after: str = Query(None, description="id of the last row of the previous page"),
+                    fields: str = Query(None, description="comma-separated columns to return, e.g. id,approvedSymbol,approvedName"), conn: duckdb.DuckDBPyConnection = Depends(get_cursor)):
+    """Search for targets by approved name or symbol, best matches first."""
+    return FastJSONResponse(search_entities(conn, "target", query, limit, after, fields))
 
 @app.get("/disease_chembl_similarity/{disease_id}/{chembl_id}", response_model=Dict)
-def get_disease_chembl_similarity(disease_id: str, chembl_id: str, top_k: int = Query(10, ge=1, le=100)):
-    """Retrieve top-k similar substances for a given disease and ChEMBL ID."""
-    
-    # Get all target IDs associated with the disease
-    target_query = """
-        SELECT DISTINCT target_id FROM tbl_disease_target WHERE disease_id = ?
+def get_disease_chembl_similarity(request: Request, disease_id: str, chembl_id: str, top_k: int = Query(10, ge=1, le=100),
+                                  include_descendants: bool = Query(False, description="score the targets of the disease and of all its subtypes"),
+                                  conn: duckdb.DuckDBPyConnection = Depends(get_cursor)):
     """
-    target_ids = conn.execute(target_query, [disease_id]).fetchall()
-    
-    if not target_ids:
-        raise HTTPException(status_code=404, detail="No targets found for this disease")
-    
-    target_ids = {tid[0] for tid in target_ids}  # Convert to set
-
-    vec_ref = conn.execute('SELECT * FROM tbl_vector_array WHERE ChEMBL_id = ?', [chembl_id]).fetchone()
-    if not vec_ref:
-        raise HTTPException(status_code=404, detail="ChEMBL ID not found in dataset")
-    vec_ref = vec_ref[1:]
-    vector_features = tuple(column[0] for column in conn.description[1:])
-    mask = np.array([1 if feature in target_ids else 0 for feature in vector_features], dtype=np.float32)
-    vec_ref = np.array(vec_ref, dtype=np.float32) * mask
-    vec_ref_norm = np.linalg.norm(vec_ref)
-
-    total = conn.execute("SELECT count(*) FROM tbl_vector_array").fetchone()[0]
-    all_vectors = conn.execute("SELECT * FROM tbl_vector_array")
-
-    similarities = []
-    for _ in range(total):
-        other_chembl_id, *vec = all_vectors.fetchone()
-        vec = np.array(vec, dtype=np.float32) * mask  # Apply mask to each vector
-        norm_product = vec_ref_norm * np.linalg.norm(vec)
-        
-        similarity = np.dot(vec_ref, vec) / (norm_product + 0) if norm_product > 0 else 0  # Avoid division by zero
-        similarity = float(similarity)  # Convert to float for JSON serialization
-        similarity = round(similarity, 6)
-
-        if similarity > 0:
-            similarities.append({"ChEMBL ID": other_chembl_id, "Similarity": similarity})
-
-    # Sort results by similarity
-    ranked_results = sorted(similarities, key=lambda x: x["Similarity"], reverse=True)
-
-    query = "SELECT * FROM tbl_knownDrugsAggregated WHERE drugId = ? and diseaseId = ?"
-    for i, row in enumerate(ranked_results):
-        chembl_id1 = row['ChEMBL ID']
-        known_drugs = [{column[0]: json.loads(value) if column[0] == 'urls' else value for column, value in zip(conn.description, row)} 
-                       for row in conn.execute(query, [chembl_id1, disease_id]).fetchall()]
-        ranked_results[i]['fld_knownDrugsAggregated'] = known_drugs
-
-    for i, row in enumerate(ranked_results):
-        chembl_id1 = row['ChEMBL ID']
-        query = "SELECT COALESCE(name, 'N/A'), isApproved FROM tbl_substances WHERE chembl_id = ?"
-        molecule_name, is_approved = conn.execute(query, [chembl_id1]).fetchone()
-
-        query = "SELECT * FROM tbl_knownDrugsAggregated WHERE drugId = ? and diseaseId = ?"
-        known_drugs_aggregated = [{column[0]: value for column, value in zip(conn.description, row)} for row in conn.execute(query, [chembl_id1, disease_id]).fetchall()]
-        if known_drugs_aggregated:
-            is_url_available = any(row['urls'] for row in known_drugs_aggregated)
-            max_phase = max(row['phase'] for row in known_drugs_aggregated)
-            max_status_for_max_phase = max((row['status'] for row in known_drugs_aggregated if row['phase'] == max_phase), key=lambda x: STATUS_NUM.get(x, 0))
-            if max_status_for_max_phase is None:
-                max_status_for_max_phase = 'N/A'
-            status_num = STATUS_NUM[max_status_for_max_phase]
+    Retrieve top-k similar substances for a given disease and ChEMBL ID.
+    With "Accept: application/x-ndjson" or "Accept: application/vnd.apache.arrow.stream" the rows are streamed one by one,
+    the reference drug first, each with a "section" column naming the list of the regular response it belongs to.
+    """
+    stream_media_type = get_stream_media_type(request.headers.get("accept"))
+    result = get_service().disease_chembl_similarity(disease_id, chembl_id, top_k, conn, include_descendants)
+    return stream_similarity_result(result, stream_media_type) if stream_media_type else FastJSONResponse(result)
+
+def stream_similarity_result(result: dict, media_type: str):
+    def iter_rows():
+        yield {"section": "reference_drug", **result["reference_drug"]}
+        for section in ("similar_drugs_primary", "similar_drugs_secondary"):
+            for row in result[section]:
+                yield {"section": section, **row}
+    return streaming_response(iter_rows(), media_type, SIMILARITY_STREAM_FIELDS, json_columns=("fld_knownDrugsAggregated",))
+
+class SimilarityPair(BaseModel):
+    disease_id: str
+    chembl_id: str
+
+class SimilarityBatchRequest(BaseModel):
+    pairs: List[SimilarityPair]
+    top_k: int = Field(10, ge=1, le=100)
+
+def _stream_similarity_batch(pairs: List[SimilarityPair], top_k: int):
+    results = get_service().disease_chembl_similarity_batch([(pair.disease_id, pair.chembl_id) for pair in pairs], top_k)
+    for index, disease_id, chembl_id, result, error in results:
+        line = {"index": index, "disease_id": disease_id, "chembl_id": chembl_id}
+        if error is None:
+            line["result"] = result
+        elif isinstance(error, NotFoundError):
+            line["error"] = {"status_code": 404, "detail": str(error)}
         else:
-            known_drugs_aggregated = []
-            is_url_available = False
-            max_phase = 0
-            max_status_for_max_phase = 'N/A'
-            status_num = 0
-
-        ranked_results[i]['Molecule Name'] = molecule_name
-        ranked_results[i]['isUrlAvailable'] = is_url_available
-        ranked_results[i]['isApproved'] = is_approved
-        ranked_results[i]['phase'] = max_phase
-        ranked_results[i]['status'] = max_status_for_max_phase
-        ranked_results[i]['status_num'] = status_num
-        ranked_results[i]['fld_knownDrugsAggregated'] = known_drugs_aggregated
-
-    reference_drug = next(row for row in ranked_results if row['ChEMBL ID'] == chembl_id)
-
-    # ------------ isApproved OR isUrlAvailable ------------------
-    results_top_k_lvl1 = [row for row in ranked_results if (row['isUrlAvailable'] or row['isApproved']) and row['ChEMBL ID'] != chembl_id]
-    results_top_k_lvl1.sort(key=lambda x: [x['Similarity'], x['isApproved'], x['isUrlAvailable'], x['phase'], x['status_num'], x['ChEMBL ID']], reverse=True)
-
-    if len(results_top_k_lvl1) > top_k - 1:
-        ref_similarity = results_top_k_lvl1[top_k - 1]["Similarity"]
-        results_top_k_lvl1 = [row for row in results_top_k_lvl1 if row['Similarity'] >= ref_similarity]
+            # same pair fails with 500 on GET /disease_chembl_similarity
+            line["error"] = {"status_code": 500, "detail": "Internal Server Error"}
+        yield to_ndjson_line(line)
 
-    # ------------ not isApproved AND not isUrlAvailable ------------------
-    results_top_k_lvl2 = [row for row in ranked_results if not row['isUrlAvailable'] and not row['isApproved'] and row['ChEMBL ID'] != chembl_id]
-    results_top_k_lvl2.sort(key=lambda x: [x['Similarity'], x['phase'], x['status_num'], x['ChEMBL ID']], reverse=True)
-
-    if len(results_top_k_lvl2) > top_k - 1:
-        ref_similarity = results_top_k_lvl2[top_k - 1]["Similarity"]
-        results_top_k_lvl2 = [row for row in results_top_k_lvl2 if row['Similarity'] >= ref_similarity]
-
-    return {'reference_drug': reference_drug, 'similar_drugs_primary': results_top_k_lvl1, 'similar_drugs_secondary': results_top_k_lvl2}
+@app.post("/disease_chembl_similarity/batch")
+def get_disease_chembl_similarity_batch(request: SimilarityBatchRequest):
+    """
+    Retrieve top-k similar substances for many (disease, ChEMBL ID) pairs.
+    The response is streamed as NDJSON, one line per pair, grouped by disease (use "index" to restore the request order).
+    Every line has either "result", the response of GET /disease_chembl_similarity, or "error" with its status code and detail.
+    """
+    return StreamingResponse(_stream_similarity_batch(request.pairs, request.top_k), media_type=NDJSON_MEDIA_TYPE)
 
 @app.get("/evidences/{disease_id}/{reference_drug_id}/{replacement_drug_id}", response_model=List)
-def get_evidences(disease_id: str, reference_drug_id: str, replacement_drug_id: str):
-    q = f'''
-    SELECT DISTINCT a.target_id
-    FROM tbl_disease_target dt
-    JOIN tbl_actions a ON dt.target_id = a.target_id
-    WHERE dt.disease_id = ? AND a.ChEMBL_id = ?
-    '''
-    target_ids = conn.execute(q, [disease_id, reference_drug_id]).fetchall()
-
-    if not target_ids:
-        raise HTTPException(status_code=404, detail="No targets found for this disease")
+def get_evidences(disease_id: str, reference_drug_id: str, replacement_drug_id: str, conn: duckdb.DuckDBPyConnection = Depends(get_cursor)):
+    return FastJSONResponse(get_service().evidences(disease_id, reference_drug_id, replacement_drug_id, conn))
+
+@app.get("/admin/cache/stats", response_model=Dict)
+def get_cache_stats():
+    """Hit/miss counters of the similarity cache."""
+    return similarity_cache.stats()
 
-    target_ids = [row[0] for row in target_ids]
-
-    placeholders = ','.join(['?']*len(target_ids))
-    q = f'''
-    SELECT a.target_id,
-        a.actionType,
-        a.mechanismOfAction,
-        r.ref_source,
-        r.ref_data
-    FROM tbl_actions a
-    LEFT JOIN tbl_refs r ON a.action_id = r.action_id
-    WHERE a.ChEMBL_id = ? AND a.target_id IN ({placeholders})
-    '''
-    rows = conn.execute(q, [replacement_drug_id, *target_ids]).fetchall()
-
-    res = {}
-    for target_id, action_type, mechanism_of_action, ref_source, ref_data in rows:
-        k = (target_id, action_type, mechanism_of_action)
-        if k not in res:
-            res[k] = {
-                'target_id': target_id,
-                'action_type': action_type,
-                'mechanism_of_action': mechanism_of_action,
-                'refs': []
-            }
-        if ref_source:
-            res[k]['refs'].append({'ref_source': ref_source, 'ref_data': ref_data})
-
-    res = sorted(res.values(), key=lambda x: (x['action_type'] == 'UNIDENTIFIED', x['target_id']))
-
-    return res
+@app.post("/admin/cache/invalidate", response_model=Dict)
+def invalidate_cache():
+    """Drop all cached similarity results."""
+    return {"invalidated": similarity_cache.clear()}
 
 @app.get("/table_ivpe", response_model=List[Dict])
-def get_table_ivpe():
-    files = [fname for fname in sorted(os.listdir(TABLE_IVPE_DIR)) if fname.endswith('.txt')]
-    result = []
-    for file in files:
-        with open(os.path.join(TABLE_IVPE_DIR, file)) as f:
-            text = f.read()
-        candidate = dict(line.split(':', 1) for line in text.split('\n') if line.strip() and not line.strip().startswith('#'))
-        result.append(candidate)
-    return result
+def get_table_ivpe(disease_id: str = Query(None, description="only the candidates of this disease"),
+                   sort_by: str = Query(None, pattern=f"^({'|'.join(IVPE_SORT_COLUMNS)})$", description="default: file order"),
+                   order: str = Query("desc", pattern="^(asc|desc)$")):
+    """The candidates of the IVPE table (TABLE_IVPE_DIR), reloaded only when its files change (see lib_utils/ivpe_table.py)."""
+    return FastJSONResponse(table_ivpe.query(disease_id, sort_by, descending=order == "desc"))
+
+@app.get("/table_ivpe_ranked", response_model=List[Dict])
+def get_table_ivpe_ranked(disease_id: str = Query(None, description="only the candidates of this disease"),
+                          sort_by: str = Query(None, pattern=f"^({'|'.join(IVPE_SORT_COLUMNS)})$", description="default: rank order"),
+                          order: str = Query("desc", pattern="^(asc|desc)$")):
+    """The scored candidates of the IVPE table ranked by annual cost reduction (TABLE_IVPE_RANKED_DIR, see 6060)."""
+    return FastJSONResponse(table_ivpe_ranked.query(disease_id, sort_by, descending=order == "desc"))
 
 
 if __name__ == "__main__":
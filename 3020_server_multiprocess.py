@@ -0,0 +1,28 @@
+"""
+This script is used to run the server in several processes sharing one memory-mapped copy of the vectors.
+
+python 3020_server_multiprocess.py      # one worker per CPU core
+python 3020_server_multiprocess.py 4    # 4 workers
+
+The vector store (see lib_utils/vector_store.py) is rebuilt before the workers start if the database has changed,
+so each worker only maps the existing files instead of loading its own copy of tbl_vector_array.
+"""
+import os
+import sys
+
+import uvicorn
+
+from lib_utils.release_config import get_active_db_path
+from lib_utils.vector_store import build_vector_store
+
+
+SERVER_APP = "3015_server_full_scoring_optimised:app"
+HOST = "0.0.0.0"
+PORT = 7334
+
+if __name__ == "__main__":  # the worker processes import this module again
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count()
+
+    build_vector_store(get_active_db_path())
+
+    uvicorn.run(SERVER_APP, host=HOST, port=PORT, workers=workers)
@@ -200,15 +200,23 @@ import sys
 import pandas as pd
 import threading
 
+from lib_utils.release_config import ENV_RELEASE, activate_release, get_release_config
+from lib_utils.vector_store import build_vector_store
+
 
 # Ensure UTF-8 encoding
 os.environ["PYTHONIOENCODING"] = "utf-8"
 
+# The release can be passed as an argument (python 5000_script_runner_contiguous.py 25.03);
+# the scripts started below inherit it through the environment.
+if len(sys.argv) > 1:
+    os.environ[ENV_RELEASE] = sys.argv[1]
+RELEASE = get_release_config()
 
 timestamp = pd.Timestamp.now().isoformat().replace(":", "-")
 
-if os.path.exists("bio_data.duck.db"):
-    os.rename("bio_data.duck.db", f"bio_data.{timestamp}.duck.db")
+if os.path.exists(RELEASE.db_path):
+    os.rename(RELEASE.db_path, RELEASE.db_path.replace(".duck.db", f".{timestamp}.duck.db"))
 
 PREFIX_SCRIPT_START = "0000"
 PREFIX_SCRIPT_END   = "0800"
@@ -284,6 +292,9 @@ def run_script_in_real_time(script_path):
 
     return returncode
 
+log_message(f"=== Building {RELEASE} ===")
+
+has_errors = False
 for script in scripts_to_run:
     start_subscript_time = pd.Timestamp.now()
     log_message(f"=== Starting {script} at {start_subscript_time} ===")
@@ -297,8 +308,15 @@ for script in scripts_to_run:
 
     if returncode != 0:
         log_message(f"❌ Error in {script} (exit code {returncode}) — stopping runner.")
+        has_errors = True
         break
 
+# switch the server to the new database only after a complete build
+if not has_errors:
+    build_vector_store(RELEASE.db_path)  # so that the server processes only have to map it
+    activate_release(RELEASE)
+    log_message(f"✅ Release {RELEASE.release} activated ({RELEASE.db_path})")
+
 time_end = pd.Timestamp.now()
 total_runtime = time_end - time_start
 log_message(f"Time taken for all scripts: {total_runtime}")
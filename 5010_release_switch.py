@@ -0,0 +1,21 @@
+"""
+This script is used to switch the server between the releases built by 5000_script_runner_contiguous.py.
+
+python 5010_release_switch.py          # show the active release
+python 5010_release_switch.py 25.03    # activate release 25.03 (bio_data.25.03.duck.db)
+
+The running server picks up the new database on the next request, no restart is required.
+"""
+import os
+import sys
+
+from lib_utils.release_config import ENV_RELEASE, activate_release, get_active_db_path, get_release_config
+
+
+if len(sys.argv) > 1:
+    os.environ[ENV_RELEASE] = sys.argv[1]
+    release = get_release_config()
+    activate_release(release)
+    print(f"✅ Release {release.release} activated ({release.db_path})")
+else:
+    print(f"Active database: {get_active_db_path()}")
@@ -19,6 +19,7 @@ BASE_URL = 'http://127.0.0.1:7334'
 LOGS_DIR = "logs"
 SERVER_SCRIPT = "3015_server_full_scoring_optimised.py"  # Update with the actual filename
 SERVER_PORT = 7334  # Change this if your server uses a different port
+SERVER_START_TIMEOUT = 300  # seconds, includes the warm-up of the server
 
 # Detect the local Python environment for both Windows and Linux
 if os.name == 'nt':  # Windows
@@ -56,12 +57,19 @@ def is_port_open(port, host="127.0.0.1"):
         s.settimeout(1)  # Set a short timeout
         return s.connect_ex((host, port)) == 0
 
+def is_server_ready():
+    """Check if the server has finished its warm-up."""
+    try:
+        return requests.get(f'{BASE_URL}/health/ready', timeout=1).status_code == 200
+    except requests.RequestException:
+        return False
+
 def wait_for_server():
-    """Wait until the server starts by checking if the port is open."""
+    """Wait until the server starts and reports ready (/health/ready)."""
     logging.info("Waiting for the server to start...")
 
-    for _ in range(30):  # Try for up to 30 seconds
-        if is_port_open(SERVER_PORT):
+    for _ in range(SERVER_START_TIMEOUT):  # Try for up to SERVER_START_TIMEOUT seconds
+        if is_port_open(SERVER_PORT) and is_server_ready():
             logging.info("Server is up and running.")
             return True
         time.sleep(1)
@@ -128,6 +136,30 @@ for row in tqdm([row for row in text.split('\n')[1:] if row.strip()]):
         print(inf)
 
 
+# test POST /disease_chembl_similarity/batch, every pair must give the same result as GET /disease_chembl_similarity
+logging.info('run tests for "POST /disease_chembl_similarity/batch"')
+
+test_rows = [row.strip().split() for row in text.split('\n')[1:] if row.strip()]
+res = requests.post(
+    f'{BASE_URL}/disease_chembl_similarity/batch',
+    json={'pairs': [{'disease_id': disease_id, 'chembl_id': chembl_id} for disease_id, chembl_id, *_ in test_rows], 'top_k': 100},
+)
+batch_results = {line['index']: line for line in (json.loads(row) for row in res.text.splitlines() if row.strip())}
+
+for index, (disease_id, chembl_id, hash_expected, description) in enumerate(test_rows):
+    result_hash = get_obj_hash(batch_results[index].get('result'))
+    logging.info(f'batch result hash: {result_hash}')
+
+    if hash_expected != result_hash:
+        err = f'\n❌ FAIL (batch): expected: {hash_expected} actual: {result_hash} for {disease_id} - {chembl_id}'
+        logging.error(err)
+        print(err)
+    else:
+        inf = f'\n✅ PASS (batch): expected: {hash_expected} actual: {result_hash} for {disease_id} - {chembl_id}'
+        logging.info(inf)
+        print(inf)
+
+
 # test GET /evidences
 with open(REFERENCE_HASH_FILES['evidences']) as f:
     text = f.read()
@@ -157,6 +189,30 @@ for row in tqdm([row for row in text.split('\n')[1:] if row.strip()]):
         print(inf)
 
 
+# test GET /disease_targets: every disease of the similarity tests has targets (target_id, target_approvedName),
+# all of them among the targets of the disease and its subtypes (include_descendants=true)
+logging.info('run tests for "GET /disease_targets"')
+
+with open(REFERENCE_HASH_FILES['disease_chembl_similarity']) as f:
+    disease_ids = sorted({row.split()[0] for row in f.read().split('\n')[1:] if row.strip()})
+
+for disease_id in tqdm(disease_ids):
+    res = requests.get(f'{BASE_URL}/disease_targets/{disease_id}')
+    res_descendants = requests.get(f'{BASE_URL}/disease_targets/{disease_id}', params={'include_descendants': 'true'})
+    targets = res.json() if res.status_code == 200 else []
+    target_ids = {row['target_id'] for row in targets}
+    logging.info(f'{disease_id}: {len(targets)} targets ({res.status_code}), {len(res_descendants.json())} with the subtypes ({res_descendants.status_code})')
+
+    if not targets or any(set(row) != {'target_id', 'target_approvedName'} for row in targets) \
+            or res_descendants.status_code != 200 or not target_ids <= {row['target_id'] for row in res_descendants.json()}:
+        err = f'\n❌ FAIL: {res.status_code} {res.text[:200]} for {disease_id}'
+        logging.error(err)
+        print(err)
+    else:
+        inf = f'\n✅ PASS: {len(targets)} targets for {disease_id}'
+        logging.info(inf)
+        print(inf)
+
 # Cleanup: Stop the server
 server_process.terminate()
 logging.info("Server terminated.")
\ No newline at end of file
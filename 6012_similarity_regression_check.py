@@ -0,0 +1,162 @@
+"""
+This script is used to check, without the server, that the similarity scoring (lib_utils/similarity_service.py)
+gives the responses of the original /disease_chembl_similarity endpoint.
+
+python 6012_similarity_regression_check.py              # the pairs of REFERENCE_HASH_FILE against their hashes
+python 6012_similarity_regression_check.py --sample 50  # 50 random (disease, molecule) pairs against a full scan
+
+The hashes of REFERENCE_HASH_FILE were recorded with the original server on the full release (see 6010_run_tests.py):
+every pair is scored with top_k=100 and the md5 of its JSON result must be the expected one.
+With --sample, the similarities of every pair are recomputed by the full scan of tbl_vector_array of the original endpoint
+(float32 dot products and norms of the full-length masked vectors), ranked the same way, and both results must have the same md5;
+the masked norms of the sampled diseases used by the service (stored by 0130 or computed on first use) must also be bit-identical
+to the np.linalg.norm of the full scan.
+This check runs on any database, e.g. a synthetic one (see 6040_synthetic_dbase_generate.py).
+Exit code 1 on a mismatch.
+"""
+import sys
+import json
+import random
+import argparse
+from hashlib import md5
+
+import numpy as np
+from tqdm import tqdm
+
+from lib_utils.fast_json import dumps
+from lib_utils.release_config import get_active_db_path
+from lib_utils.similarity_service import NotFoundError, SimilarityService
+
+
+REFERENCE_HASH_FILE = 'tests/disease_chembl_similarity/test_batch_005_AB.txt'
+TOP_K = 100
+BATCH_SIZE = 1000  # rows read from tbl_vector_array at once
+
+
+def get_obj_hash(obj):
+    return md5(json.dumps(obj, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def get_result_hash(result: dict):
+    """md5 of the result as 6010_run_tests.py computes it, i.e. of the JSON response of the server."""
+    return get_obj_hash(json.loads(dumps(result)))
+
+
+def load_vectors(conn):
+    """Returns the ChEMBL ids, the features and the float32 vectors of tbl_vector_array, in table order."""
+    total = conn.execute("SELECT count(*) FROM tbl_vector_array").fetchone()[0]
+    cursor = conn.execute("SELECT * FROM tbl_vector_array")
+    features = [column[0] for column in cursor.description[1:]]
+    chembl_ids = []
+    matrix = np.empty((total, len(features)), dtype=np.float32)
+    while True:
+        rows = cursor.fetchmany(BATCH_SIZE)
+        if not rows:
+            break
+        matrix[len(chembl_ids):len(chembl_ids) + len(rows)] = np.array([row[1:] for row in rows], dtype=np.float32)
+        chembl_ids.extend(row[0] for row in rows)
+    return chembl_ids, features, matrix
+
+
+def get_disease_mask(conn, features: list, disease_id: str):
+    """The mask of the original endpoint, None if the disease has no targets."""
+    target_ids = {row[0] for row in conn.execute("SELECT DISTINCT target_id FROM tbl_disease_target WHERE disease_id = ?", [disease_id]).fetchall()}
+    if not target_ids:
+        return None
+    return np.array([1 if feature in target_ids else 0 for feature in features], dtype=np.float32)
+
+
+def full_scan_similarities(conn, vectors, disease_id: str, chembl_id: str):
+    """The similarities of the original endpoint: every molecule of tbl_vector_array is scored, in table order."""
+    chembl_ids, features, matrix = vectors
+    mask = get_disease_mask(conn, features, disease_id)
+    if mask is None:
+        raise NotFoundError("No targets found for this disease")
+    if chembl_id not in chembl_ids:
+        raise NotFoundError("ChEMBL ID not found in dataset")
+    vec_ref = matrix[chembl_ids.index(chembl_id)] * mask
+    vec_ref_norm = np.linalg.norm(vec_ref)
+
+    similarities = []
+    for other_chembl_id, vec in zip(chembl_ids, matrix):
+        vec = vec * mask  # Apply mask to each vector
+        norm_product = vec_ref_norm * np.linalg.norm(vec)
+
+        similarity = np.dot(vec_ref, vec) / (norm_product + 0) if norm_product > 0 else 0  # Avoid division by zero
+        similarity = float(similarity)  # Convert to float for JSON serialization
+        similarity = round(similarity, 6)
+
+        if similarity > 0:
+            similarities.append({"ChEMBL ID": other_chembl_id, "Similarity": similarity})
+    return similarities
+
+
+def get_norm_mismatches(service: SimilarityService, conn, vectors, disease_id: str):
+    """The molecules whose masked norm used by the service differs (in any bit) from the one of the original endpoint."""
+    chembl_ids, features, matrix = vectors
+    mask = get_disease_mask(conn, features, disease_id)
+    expected = {}
+    for chembl_id, vec in zip(chembl_ids, matrix):
+        norm = np.linalg.norm(vec * mask)
+        if norm > 0:
+            expected[chembl_id] = norm
+    rows, norms = service.get_disease_masked_norms(conn, disease_id, service.store.get_disease_columns(disease_id))
+    actual = {str(service.store.chembl_ids[row]): norm for row, norm in zip(rows, norms)}
+    return sorted(chembl_id for chembl_id in expected.keys() | actual.keys() if expected.get(chembl_id) != actual.get(chembl_id))
+
+
+def sample_pairs(conn, n: int, seed: int):
+    """n random (disease, molecule) pairs, the molecule acting on a target of the disease."""
+    rng = random.Random(seed)
+    disease_ids = [row[0] for row in conn.execute("SELECT DISTINCT disease_id FROM tbl_disease_target ORDER BY 1").fetchall()]
+    pairs = []
+    for disease_id in rng.sample(disease_ids, min(n, len(disease_ids))):
+        chembl_ids = [row[0] for row in conn.execute("""
+            SELECT DISTINCT a.ChEMBL_id FROM tbl_actions a
+            JOIN tbl_disease_target dt ON dt.target_id = a.target_id
+            WHERE dt.disease_id = ? AND a.ChEMBL_id IN (SELECT ChEMBL_id FROM tbl_vector_array)
+            ORDER BY 1
+        """, [disease_id]).fetchall()]
+        if chembl_ids:
+            pairs.append((disease_id, rng.choice(chembl_ids)))
+    return pairs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compares the similarity scoring with the original endpoint.")
+    parser.add_argument("--sample", type=int, default=None, help="number of random pairs compared with a full scan")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    service = SimilarityService(get_active_db_path(), pool_size=1)
+    failures = 0
+    with service.pool.cursor() as conn:
+        if args.sample is None:
+            with open(REFERENCE_HASH_FILE) as f:
+                rows = [row.strip().split() for row in f.read().split('\n')[1:] if row.strip()]
+            checks = [(disease_id, chembl_id, hash_expected) for disease_id, chembl_id, hash_expected, *_ in rows]
+        else:
+            vectors = load_vectors(conn)
+            checks = [(disease_id, chembl_id, None) for disease_id, chembl_id in sample_pairs(conn, args.sample, args.seed)]
+            for disease_id in tqdm(sorted({disease_id for disease_id, _, _ in checks}), desc="Comparing norms"):
+                mismatches = get_norm_mismatches(service, conn, vectors, disease_id)
+                if mismatches:
+                    failures += 1
+                    print(f'❌ FAIL: masked norms of {len(mismatches)} molecules differ for {disease_id}, e.g. {mismatches[0]}')
+
+        for disease_id, chembl_id, hash_expected in tqdm(checks, desc="Comparing"):
+            try:
+                result_hash = get_result_hash(service.disease_chembl_similarity(disease_id, chembl_id, TOP_K, conn))
+            except NotFoundError as e:
+                result_hash = f'404 {e}'
+            if hash_expected is None:
+                similarities = full_scan_similarities(conn, vectors, disease_id, chembl_id)
+                hash_expected = get_result_hash(service.rank_disease_similarities(conn, disease_id, chembl_id, TOP_K, similarities))
+            if result_hash != hash_expected:
+                failures += 1
+                print(f'❌ FAIL: expected: {hash_expected} actual: {result_hash} for {disease_id} - {chembl_id}')
+
+    if failures:
+        print(f"❌ {failures} results or diseases differ from the original endpoint")
+        sys.exit(1)
+    print(f"✅ {len(checks)} results identical to the original endpoint")
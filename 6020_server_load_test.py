@@ -0,0 +1,130 @@
+"""
+This script is used to check that the server throughput scales with the number of DuckDB cursors (AFFORDABLE_DB_POOL_SIZE).
+For every pool size the server is restarted and the same number of concurrent clients replays the test pairs.
+The result cache of the server is disabled (AFFORDABLE_CACHE_SIZE=0): the pairs are replayed many times,
+so with the cache on every request after the first pass would be a cache hit and the cursors would not be measured.
+"""
+import os
+import logging
+import datetime as dt
+import subprocess
+import time
+import socket
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+
+TEST_PAIRS_FILE = 'tests/disease_chembl_similarity/test_batch_005_AB.txt'
+POOL_SIZES = [1, 2, 4, 8]
+REQUESTS_PER_WORKER = 5
+TOP_K = 100
+
+BASE_URL = 'http://127.0.0.1:7334'
+LOGS_DIR = "logs"
+SERVER_SCRIPT = "3015_server_full_scoring_optimised.py"
+SERVER_PORT = 7334
+SERVER_START_TIMEOUT = 300  # seconds, includes the warm-up of the server
+
+# Detect the local Python environment for both Windows and Linux
+if os.name == 'nt':  # Windows
+    VENV_PYTHON = os.path.join(os.getcwd(), "venv", "Scripts", "python.exe")
+else:  # Linux/Mac
+    VENV_PYTHON = os.path.join(os.getcwd(), "venv", "bin", "python")
+PYTHON_EXECUTABLE = VENV_PYTHON if os.path.exists(VENV_PYTHON) else "python3"
+
+# Ensure logs directory exists
+os.makedirs(LOGS_DIR, exist_ok=True)
+logging.basicConfig(
+    filename=os.path.join(LOGS_DIR, "load_test_" + dt.datetime.now().isoformat().replace(":", "-") + ".log"),
+    format="%(levelname)s: %(message)s",
+    level=logging.DEBUG,
+)
+
+def start_server(pool_size):
+    """Start the server as a subprocess with the given number of pooled cursors."""
+    logging.info(f"Starting the server using {PYTHON_EXECUTABLE} (pool size {pool_size})...")
+
+    log_file_path = os.path.join(LOGS_DIR, "server_output.log")
+    with open(log_file_path, "w") as log_file:
+        server_process = subprocess.Popen(
+            [PYTHON_EXECUTABLE, SERVER_SCRIPT],
+            stdout=log_file,
+            stderr=subprocess.STDOUT,
+            env={
+                **os.environ,
+                "PATH": os.path.dirname(PYTHON_EXECUTABLE) + os.pathsep + os.environ["PATH"],  # Ensure virtual environment is used
+                "AFFORDABLE_DB_POOL_SIZE": str(pool_size),
+                "AFFORDABLE_CACHE_SIZE": "0",  # every request is scored
+            }
+        )
+
+    return server_process
+
+def is_port_open(port, host="127.0.0.1"):
+    """Check if a specific port is open."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.settimeout(1)  # Set a short timeout
+        return s.connect_ex((host, port)) == 0
+
+def is_server_ready():
+    """Check if the server has finished its warm-up."""
+    try:
+        return requests.get(f'{BASE_URL}/health/ready', timeout=1).status_code == 200
+    except requests.RequestException:
+        return False
+
+def wait_for_server():
+    """Wait until the server starts and reports ready (/health/ready)."""
+    for _ in range(SERVER_START_TIMEOUT):  # Try for up to SERVER_START_TIMEOUT seconds
+        if is_port_open(SERVER_PORT) and is_server_ready():
+            return True
+        time.sleep(1)
+    return False
+
+def wait_for_shutdown():
+    for _ in range(30):
+        if not is_port_open(SERVER_PORT):
+            return
+        time.sleep(1)
+
+def run_worker(pairs):
+    session = requests.Session()
+    for disease_id, chembl_id in pairs:
+        res = session.get(f'{BASE_URL}/disease_chembl_similarity/{disease_id}/{chembl_id}?top_k={TOP_K}')
+        res.raise_for_status()
+
+
+with open(TEST_PAIRS_FILE) as f:
+    test_pairs = [tuple(row.split()[:2]) for row in f.read().split('\n')[1:] if row.strip()]
+
+results = []
+for pool_size in POOL_SIZES:
+    server_process = start_server(pool_size)
+    if not wait_for_server():
+        logging.error("Server did not start. Exiting.")
+        server_process.terminate()
+        exit(1)
+
+    run_worker(test_pairs[:1])  # warm-up request
+
+    # every worker replays the test pairs, shifted so that the workers do not request the same pair at the same time
+    workloads = [
+        [test_pairs[(w + i) % len(test_pairs)] for i in range(REQUESTS_PER_WORKER)]
+        for w in range(pool_size)
+    ]
+    time_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=pool_size) as executor:
+        list(executor.map(run_worker, workloads))
+    elapsed = time.perf_counter() - time_start
+
+    n_requests = pool_size * REQUESTS_PER_WORKER
+    results.append((pool_size, n_requests, elapsed, n_requests / elapsed))
+    logging.info(f"pool size {pool_size}: {n_requests} requests in {elapsed:.2f}s ({n_requests / elapsed:.2f} req/s)")
+
+    server_process.terminate()
+    server_process.wait()
+    wait_for_shutdown()
+
+print(f"{'pool size':<12}{'requests':<12}{'time, s':<12}{'req/s':<12}{'speedup':<12}")
+for pool_size, n_requests, elapsed, throughput in results:
+    print(f"{pool_size:<12}{n_requests:<12}{elapsed:<12.2f}{throughput:<12.2f}{throughput / results[0][3]:<12.2f}")
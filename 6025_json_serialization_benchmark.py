@@ -0,0 +1,78 @@
+"""
+This script is used to measure the JSON serialization cost of the server responses.
+Real payloads are produced by the server app (in process, no HTTP) for the test pairs,
+then every payload is serialized with the default FastAPI path (jsonable_encoder + JSONResponse)
+and with FastJSONResponse (lib_utils/fast_json.py).
+"""
+import importlib
+import json
+import os
+import timeit
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+from lib_utils import fast_json
+from lib_utils.fast_json import FastJSONResponse
+
+
+SIMILARITY_TESTS_DIR = 'tests/disease_chembl_similarity'
+EVIDENCES_TESTS_DIR = 'tests/evidences'
+SEARCH_QUERIES = ['cell', 'ketamine', 'cancer', 'receptor']
+TOP_K = 100
+REPEAT = 20  # serializations per payload and method
+
+SERVER_MODULE = "3015_server_full_scoring_optimised"
+
+
+def read_test_rows(tests_dir):
+    rows = []
+    for fname in sorted(os.listdir(tests_dir)):
+        if fname.endswith('.txt'):
+            with open(os.path.join(tests_dir, fname)) as f:
+                rows.extend(row.split() for row in f.read().split('\n')[1:] if row.strip())
+    return rows
+
+
+def default_render(payload):
+    # what FastAPI does for an endpoint returning plain dicts and lists
+    return JSONResponse(jsonable_encoder(payload)).body
+
+
+def fast_render(payload):
+    return FastJSONResponse(payload).body
+
+
+client = TestClient(importlib.import_module(SERVER_MODULE).app, raise_server_exceptions=False)  # failing requests are skipped
+
+payloads = {'similarity': [], 'evidences': [], 'search': [], 'table_ivpe': []}
+for disease_id, chembl_id in dict.fromkeys(tuple(row[:2]) for row in read_test_rows(SIMILARITY_TESTS_DIR)):
+    res = client.get(f'/disease_chembl_similarity/{disease_id}/{chembl_id}?top_k={TOP_K}')
+    if res.status_code == 200:
+        payloads['similarity'].append(res.json())
+for disease_id, reference_drug_id, replacement_drug_id, *_ in read_test_rows(EVIDENCES_TESTS_DIR):
+    res = client.get(f'/evidences/{disease_id}/{reference_drug_id}/{replacement_drug_id}')
+    if res.status_code == 200:
+        payloads['evidences'].append(res.json())
+for query in SEARCH_QUERIES:
+    for entity in ('molecules', 'diseases', 'targets'):
+        res = client.get(f'/search/{entity}', params={'query': query})
+        if res.status_code == 200:
+            payloads['search'].append(res.json())
+res = client.get('/table_ivpe')
+if res.status_code == 200:
+    payloads['table_ivpe'].append(res.json())
+
+print(f"JSON library: {'orjson' if fast_json.orjson is not None else 'json (standard library)'}")
+print(f"{'endpoint':<12}{'payloads':>10}{'size, KB':>12}{'default, ms':>14}{'fast, ms':>12}{'speedup':>10}")
+for endpoint, endpoint_payloads in payloads.items():
+    if not endpoint_payloads:
+        print(f"{endpoint:<12}{0:>10}")
+        continue
+    for payload in endpoint_payloads:
+        assert json.loads(default_render(payload)) == json.loads(fast_render(payload))  # same content
+    size = sum(len(fast_render(payload)) for payload in endpoint_payloads) / 1024
+    time_default = min(timeit.repeat(lambda: [default_render(payload) for payload in endpoint_payloads], number=1, repeat=REPEAT)) * 1000
+    time_fast = min(timeit.repeat(lambda: [fast_render(payload) for payload in endpoint_payloads], number=1, repeat=REPEAT)) * 1000
+    print(f"{endpoint:<12}{len(endpoint_payloads):>10}{size:>12.1f}{time_default:>14.2f}{time_fast:>12.2f}{time_default / time_fast:>10.1f}")
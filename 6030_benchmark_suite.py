@@ -0,0 +1,255 @@
+"""
+This script is used to benchmark the server with the test cases of 6010_run_tests.py.
+
+python 6030_benchmark_suite.py                                   # concurrency 1, 4 and 8
+python 6030_benchmark_suite.py --concurrency 1 16 --repeat 3
+python 6030_benchmark_suite.py --baseline benchmarks/baseline.json   # exit code 1 on a regression
+
+The (disease_id, chembl_id) pairs of tests/disease_chembl_similarity/*.txt and the triples of tests/evidences/*.txt
+are replayed against a server started with its result cache disabled (AFFORDABLE_CACHE_SIZE=0), so that the repeated
+and duplicate test cases are scored every time instead of being served from the cache.
+For every endpoint and concurrency level the results record the latency percentiles (p50/p95/p99, ms), the throughput
+(req/s), the number of errors and the resident memory of the server (current and peak, MB).
+The results are written as JSON with sorted keys, so two result files can be diffed directly or compared with --baseline.
+"""
+import os
+import sys
+import glob
+import json
+import logging
+import argparse
+import datetime as dt
+import platform
+import subprocess
+import time
+import socket
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import requests
+
+try:
+    import psutil
+except ImportError:  # optional dependency, only used where there is no /proc (Windows, macOS)
+    psutil = None
+
+
+TEST_FILES = {
+    'disease_chembl_similarity': 'tests/disease_chembl_similarity/*.txt',
+    'evidences': 'tests/evidences/*.txt',
+}
+TOP_K = 10
+
+BASE_URL = 'http://127.0.0.1:7334'
+LOGS_DIR = "logs"
+RESULTS_DIR = "benchmarks"
+SERVER_SCRIPT = "3015_server_full_scoring_optimised.py"
+SERVER_PORT = 7334
+SERVER_START_TIMEOUT = 300  # seconds, includes the warm-up of the server
+REQUEST_TIMEOUT = 120  # seconds
+
+# metrics compared with the baseline: name -> True if higher is better
+COMPARED_METRICS = {"p50_ms": False, "p95_ms": False, "p99_ms": False, "throughput_rps": True, "rss_peak_mb": False}
+
+# Detect the local Python environment for both Windows and Linux
+if os.name == 'nt':  # Windows
+    VENV_PYTHON = os.path.join(os.getcwd(), "venv", "Scripts", "python.exe")
+else:  # Linux/Mac
+    VENV_PYTHON = os.path.join(os.getcwd(), "venv", "bin", "python")
+PYTHON_EXECUTABLE = VENV_PYTHON if os.path.exists(VENV_PYTHON) else "python3"
+
+# Ensure logs directory exists
+os.makedirs(LOGS_DIR, exist_ok=True)
+logging.basicConfig(
+    filename=os.path.join(LOGS_DIR, "benchmark_" + dt.datetime.now().isoformat().replace(":", "-") + ".log"),
+    format="%(levelname)s: %(message)s",
+    level=logging.DEBUG,
+)
+
+def start_server():
+    """Start the server as a subprocess using the local Python environment."""
+    logging.info(f"Starting the server using {PYTHON_EXECUTABLE}...")
+
+    log_file_path = os.path.join(LOGS_DIR, "server_output.log")
+    with open(log_file_path, "w") as log_file:
+        server_process = subprocess.Popen(
+            [PYTHON_EXECUTABLE, SERVER_SCRIPT],
+            stdout=log_file,
+            stderr=subprocess.STDOUT,
+            env={
+                **os.environ,
+                "PATH": os.path.dirname(PYTHON_EXECUTABLE) + os.pathsep + os.environ["PATH"],  # Ensure virtual environment is used
+                "AFFORDABLE_CACHE_SIZE": "0",  # every request is scored
+            }
+        )
+
+    return server_process
+
+def is_port_open(port, host="127.0.0.1"):
+    """Check if a specific port is open."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.settimeout(1)  # Set a short timeout
+        return s.connect_ex((host, port)) == 0
+
+def is_server_ready():
+    """Check if the server has finished its warm-up."""
+    try:
+        return requests.get(f'{BASE_URL}/health/ready', timeout=1).status_code == 200
+    except requests.RequestException:
+        return False
+
+def wait_for_server():
+    """Wait until the server starts and reports ready (/health/ready)."""
+    for _ in range(SERVER_START_TIMEOUT):  # Try for up to SERVER_START_TIMEOUT seconds
+        if is_port_open(SERVER_PORT) and is_server_ready():
+            return True
+        time.sleep(1)
+    return False
+
+def wait_for_shutdown():
+    for _ in range(30):
+        if not is_port_open(SERVER_PORT):
+            return
+        time.sleep(1)
+
+def get_rss_mb(pid):
+    """Returns the (current, peak) resident memory of the process in MB, None if it cannot be read."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            status = dict(line.split(":", 1) for line in f if ":" in line)
+        # Linux, values in kB: VmHWM is the peak resident memory of the process
+        return round(int(status["VmRSS"].split()[0]) / 1024, 1), round(int(status["VmHWM"].split()[0]) / 1024, 1)
+    except OSError:
+        pass
+    if psutil is None:
+        return None, None
+    info = psutil.Process(pid).memory_info()
+    peak = getattr(info, "peak_wset", None)  # only reported on Windows
+    return round(info.rss / 2**20, 1), None if peak is None else round(peak / 2**20, 1)
+
+def load_test_urls():
+    """Returns the request paths of every endpoint, read from its test files."""
+    urls = {}
+    for endpoint, pattern in TEST_FILES.items():
+        urls[endpoint] = []
+        for file_path in sorted(glob.glob(pattern)):
+            with open(file_path) as f:
+                rows = [row.split() for row in f.read().split('\n')[1:] if row.strip()]
+            for row in rows:
+                if endpoint == 'disease_chembl_similarity':
+                    urls[endpoint].append(f'/disease_chembl_similarity/{row[0]}/{row[1]}?top_k={TOP_K}')
+                else:
+                    urls[endpoint].append(f'/evidences/{row[0]}/{row[1]}/{row[2]}')
+    return urls
+
+def run_worker(paths):
+    """Requests the paths one by one, returns the (latency in seconds, ok) of every request."""
+    session = requests.Session()
+    timings = []
+    for path in paths:
+        time_start = time.perf_counter()
+        try:
+            ok = session.get(f'{BASE_URL}{path}', timeout=REQUEST_TIMEOUT).status_code == 200
+        except requests.RequestException:
+            ok = False
+        timings.append((time.perf_counter() - time_start, ok))
+    return timings
+
+def run_benchmark(paths, concurrency, server_pid):
+    """Replays the paths with `concurrency` clients, every client takes every `concurrency`-th path."""
+    workloads = [paths[w::concurrency] for w in range(concurrency)]
+    time_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        timings = [timing for worker_timings in executor.map(run_worker, workloads) for timing in worker_timings]
+    elapsed = time.perf_counter() - time_start
+
+    latencies_ms = np.array([latency for latency, _ in timings]) * 1000
+    rss_mb, rss_peak_mb = get_rss_mb(server_pid)
+    return {
+        "requests": len(timings),
+        "errors": sum(not ok for _, ok in timings),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(timings) / elapsed, 2),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 2),
+        "max_ms": round(float(latencies_ms.max()), 2),
+        "rss_mb": rss_mb,
+        "rss_peak_mb": rss_peak_mb,
+    }
+
+def compare_with_baseline(results, baseline, tolerance):
+    """Prints the change of every compared metric, returns the regressions (changes worse than the tolerance)."""
+    regressions = []
+    print(f"\n{'run':<36}{'metric':<16}{'baseline':>12}{'current':>12}{'change':>10}")
+    for run, metrics in sorted(results["runs"].items()):
+        baseline_metrics = baseline.get("runs", {}).get(run)
+        if baseline_metrics is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = baseline_metrics.get(metric), metrics.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            regressed = (change < -tolerance) if higher_is_better else (change > tolerance)
+            if regressed:
+                regressions.append((run, metric, old, new))
+            print(f"{run:<36}{metric:<16}{old:>12}{new:>12}{change:>+10.1%}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replays the test cases against the server and records latency, throughput and memory.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8], help="numbers of concurrent clients")
+    parser.add_argument("--repeat", type=int, default=1, help="times every test case is replayed in a run")
+    parser.add_argument("--output", default=None, help=f"results file (default: {RESULTS_DIR}/benchmark_<time>.json)")
+    parser.add_argument("--baseline", default=None, help="results file to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="relative change reported as a regression")
+    args = parser.parse_args()
+
+    test_urls = load_test_urls()
+
+    server_process = start_server()
+    if not wait_for_server():
+        logging.error("Server did not start. Exiting.")
+        server_process.terminate()
+        sys.exit(1)
+
+    results = {
+        "timestamp": dt.datetime.now().isoformat(timespec="seconds"),
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpu_count": os.cpu_count()},
+        "server": {"script": SERVER_SCRIPT, "rss_after_warm_up_mb": get_rss_mb(server_process.pid)[0]},
+        "runs": {},
+    }
+    try:
+        for endpoint, paths in test_urls.items():
+            paths = paths * args.repeat
+            run_worker(paths[:1])  # warm-up request
+            for concurrency in args.concurrency:
+                run = f"{endpoint}@c{concurrency}"
+                results["runs"][run] = run_benchmark(paths, concurrency, server_process.pid)
+                logging.info(f"{run}: {results['runs'][run]}")
+    finally:
+        server_process.terminate()
+        server_process.wait()
+        wait_for_shutdown()
+
+    print(f"{'run':<36}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50, ms':>10}{'p95, ms':>10}{'p99, ms':>10}{'RSS, MB':>10}")
+    for run, metrics in results["runs"].items():
+        print(f"{run:<36}{metrics['requests']:>10}{metrics['errors']:>8}{metrics['throughput_rps']:>10}"
+              f"{metrics['p50_ms']:>10}{metrics['p95_ms']:>10}{metrics['p99_ms']:>10}{str(metrics['rss_peak_mb']):>10}")
+
+    output = args.output or os.path.join(RESULTS_DIR, "benchmark_" + dt.datetime.now().isoformat().replace(":", "-") + ".json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+    print(f"\n✅ Results saved to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%} of the baseline")
+            sys.exit(1)
+        print("\n✅ No regression beyond the tolerance")
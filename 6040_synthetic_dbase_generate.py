@@ -0,0 +1,358 @@
+"""
+This script is used to generate a synthetic database with the schema of 0025_dbase_create.py, to test and benchmark
+the pipeline and the server offline (no Open Targets download), at the real size or larger.
+
+python 6040_synthetic_dbase_generate.py                                  # ~ real size -> bio_data.synthetic.duck.db
+python 6040_synthetic_dbase_generate.py --scale 10 --output bio_data.synthetic_10x.duck.db
+python 6040_synthetic_dbase_generate.py --scale 100 --tables-only       # base tables only, no derived stages
+
+The generated tables are the ones filled from the downloaded data (stages 0030-0100):
+    tbl_molecules, tbl_substances, tbl_targets, tbl_actions, tbl_refs, tbl_diseases (a random ontology DAG),
+    tbl_disease_target, tbl_disease_substance, tbl_knownDrugsAggregated
+then the derived stages (DERIVED_STAGES) run on the new database as in 5000_script_runner_contiguous.py,
+each timed, and the vector store is built. Serve the result with OT_DB_PATH=<output> python 3015_server_full_scoring_optimised.py.
+
+--scale multiplies the numbers of molecules, diseases and known drug rows; the number of targets does not grow with it
+(the genes of the human genome are a bounded set) unless --targets is given.
+Target popularity follows a Zipf law (--target-skew), so a few targets are hit by many molecules and most by none,
+as in the real data. The defaults are of the order of magnitude of release 24.09.
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import subprocess
+import numpy as np
+import pandas as pd
+import duckdb
+
+from lib_utils.release_config import ENV_DB_PATH
+from lib_utils.vector_store import build_vector_store, get_vector_store_dir
+
+
+DEFAULT_OUTPUT = "bio_data.synthetic.duck.db"
+SCHEMA_STAGE = "0025_dbase_create.py"
+DERIVED_STAGES = [
+    "0050_action_type_value_assigner.py",
+    "0091_dbase_indirect_drug_disease_target_linkage.py",
+    "0101_dbase_search_index_create.py",
+    "0105_dbase_known_drug_summary_create.py",
+    "0111_dbase_vectorization_to_json.py",
+    "0120_dbase_json_to_sparse_vectors_tsv.py",
+    "0121_tsv_sparse_vectors_injest.py",
+    "0130_dbase_masked_norms_precompute.py",
+    "0140_dbase_evidences_compile.py",
+    "0145_xml_orpha_net_prevalence_injest.py",
+    "0150_dbase_disease_prevalence_create.py",
+    "0160_dbase_disease_closure_create.py",
+]
+
+# actionType -> share of the mechanisms of action (UNIDENTIFIED actions are added by 0091)
+DEFAULT_ACTION_TYPES = {
+    'INHIBITOR': 0.40,
+    'ANTAGONIST': 0.15,
+    'AGONIST': 0.12,
+    'BLOCKER': 0.06,
+    'MODULATOR': 0.05,
+    'POSITIVE ALLOSTERIC MODULATOR': 0.04,
+    'BINDING AGENT': 0.04,
+    'ACTIVATOR': 0.03,
+    'OPENER': 0.02,
+    'PARTIAL AGONIST': 0.02,
+    'INVERSE AGONIST': 0.02,
+    'RELEASING AGENT': 0.02,
+    'DEGRADER': 0.01,
+    'OTHER': 0.02,
+}
+REF_SOURCES = ['PubMed', 'DailyMed', 'FDA', 'Wikipedia', 'ClinicalTrials', 'Expert', 'ISBN']
+# status -> share of the known drug rows
+STATUSES = {
+    'Completed': 0.35, 'Recruiting': 0.15, 'Active, not recruiting': 0.08, 'Not yet recruiting': 0.04,
+    'Terminated': 0.08, 'Withdrawn': 0.03, 'Unknown status': 0.07, 'Enrolling by invitation': 0.01, None: 0.19,
+}
+DRUG_TYPES = {'Small molecule': 0.75, 'Antibody': 0.12, 'Protein': 0.06, 'Oligonucleotide': 0.03, 'Cell': 0.02, 'Unknown': 0.02}
+ONTOLOGIES = ['EFO', 'MONDO', 'HP']
+N_THERAPEUTIC_AREAS = 25  # roots of the disease DAG
+
+
+def parse_distribution(text: str):
+    """'INHIBITOR=0.5,AGONIST=0.5' -> {'INHIBITOR': 0.5, 'AGONIST': 0.5}"""
+    distribution = {}
+    for item in text.split(','):
+        name, share = item.rsplit('=', 1)
+        distribution[name.strip()] = float(share)
+    return distribution
+
+
+def choice(rng, distribution: dict, size: int):
+    """Draws size values from a {value: share} distribution (the shares are normalized)."""
+    values = list(distribution)
+    p = np.array(list(distribution.values()), dtype=float)
+    return np.array(values, dtype=object)[rng.choice(len(values), size=size, p=p / p.sum())]
+
+
+def zipf_weights(n: int, skew: float):
+    weights = 1.0 / np.arange(1, n + 1) ** skew
+    return weights / weights.sum()
+
+
+def counts_per_item(rng, n_items: int, mean: float, minimum: int = 1):
+    """Number of links of every item: minimum + geometric, with the given mean."""
+    extra = mean - minimum
+    if extra <= 0:
+        return np.full(n_items, minimum)
+    return minimum + rng.geometric(1 / (extra + 1), size=n_items) - 1
+
+
+def sample_links(rng, n_items: int, counts: np.ndarray, n_targets: int, p: np.ndarray):
+    """(item, target) index pairs: counts[i] targets drawn for item i with the popularity p, duplicates removed."""
+    items = np.repeat(np.arange(n_items), counts)
+    targets = rng.choice(n_targets, size=len(items), p=p)
+    pairs = np.unique(np.stack([items, targets], axis=1), axis=0)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def insert(con: duckdb.DuckDBPyConnection, table: str, df: pd.DataFrame):
+    con.register("df_synthetic", df)
+    con.execute(f"INSERT INTO {table} BY NAME SELECT * FROM df_synthetic")
+    con.unregister("df_synthetic")
+    print(f"{table}: {len(df)} rows")
+
+
+def generate_targets(con, rng, n_targets: int):
+    ids = np.array([f"ENSG{i:011d}" for i in range(n_targets)], dtype=object)
+    df = pd.DataFrame({
+        "id": ids,
+        "approvedSymbol": [f"SYN{i}" for i in range(n_targets)],
+        "biotype": "protein_coding",
+        "approvedName": [f"synthetic protein {i}" for i in range(n_targets)],
+    })
+    insert(con, "tbl_targets", df)
+    return ids
+
+
+def generate_molecules(con, rng, n_molecules: int):
+    ids = np.array([f"CHEMBL{1000000 + i}" for i in range(n_molecules)], dtype=object)
+    phase = rng.choice([0.5, 1.0, 2.0, 3.0, 4.0], size=n_molecules, p=[0.05, 0.3, 0.3, 0.15, 0.2])
+    is_approved = phase == 4.0
+    has_name = rng.random(n_molecules) < 0.9
+    names = np.where(has_name, [f"SYNTHOMAB-{i}" for i in range(n_molecules)], None)
+    df = pd.DataFrame({
+        "id": ids,
+        "drugType": choice(rng, DRUG_TYPES, n_molecules),
+        "blackBoxWarning": rng.random(n_molecules) < 0.05,
+        "name": names,
+        "yearOfFirstApproval": np.where(is_approved, rng.integers(1950, 2025, size=n_molecules), None),
+        "maximumClinicalTrialPhase": phase.astype(np.float32),
+        "hasBeenWithdrawn": is_approved & (rng.random(n_molecules) < 0.03),
+        "isApproved": is_approved,
+        "tradeNames": [[f"Synthex{i}"] if approved else [] for i, approved in enumerate(is_approved)],
+        "synonyms": [[f"SYN-{i}", f"synthetic compound {i}"] for i in range(n_molecules)],
+        "description": [f"Synthetic molecule {i}" for i in range(n_molecules)],
+    })
+    insert(con, "tbl_molecules", df)
+    con.execute("INSERT INTO tbl_substances SELECT * FROM tbl_molecules")
+    return ids, phase
+
+
+def generate_diseases(con, rng, n_diseases: int, orphanet_fraction: float):
+    """Diseases of a random ontology DAG: every disease but the roots has one parent (sometimes two) among the previous ones."""
+    ids = np.array([f"{ONTOLOGIES[i % len(ONTOLOGIES)]}_{i:07d}" for i in range(n_diseases)], dtype=object)
+    n_roots = min(N_THERAPEUTIC_AREAS, n_diseases)
+    children = np.arange(n_roots, n_diseases)
+    # a parent drawn uniformly among the previous diseases gives a depth of ~ln(n_diseases) levels
+    parents = (children * rng.random(len(children))).astype(np.int64)
+    second = rng.random(len(children)) < 0.15
+    edges = pd.DataFrame({
+        "child": np.concatenate([children, children[second]]),
+        "parent": np.concatenate([parents, (children[second] * rng.random(second.sum())).astype(np.int64)]),
+    }).drop_duplicates()
+    edges = edges[edges.child != edges.parent]
+
+    orphanet = rng.random(n_diseases) < orphanet_fraction
+    df = pd.DataFrame({
+        "id": ids,
+        "code": [f"http://www.ebi.ac.uk/efo/{disease_id}" for disease_id in ids],
+        "dbXRefs": [[f"MONDO:{i:07d}"] + ([f"Orphanet:{100000 + i}"] if orphan else []) for i, orphan in enumerate(orphanet)],
+        "name": [f"synthetic disease {i}" for i in range(n_diseases)],
+        "description": [f"Synthetic disease number {i}" for i in range(n_diseases)],
+        "synonyms": [json.dumps({"hasExactSynonym": [f"syndrome {i}"]}) for i in range(n_diseases)],
+        "ontology": json.dumps({"isTherapeuticArea": False, "leaf": False}),
+    })
+
+    # parents, children, ancestors and descendants from the edges (the ancestors with a recursive query)
+    con.register("df_diseases", df)
+    con.register("df_edges", edges.assign(child=ids[edges.child.to_numpy()], parent=ids[edges.parent.to_numpy()]))
+    con.execute("""
+        CREATE TEMP TABLE tmp_ancestors AS
+        WITH RECURSIVE closure(descendant, ancestor) AS (
+            SELECT child, parent FROM df_edges
+            UNION
+            SELECT c.descendant, e.parent FROM closure c JOIN df_edges e ON e.child = c.ancestor
+        )
+        SELECT * FROM closure
+    """)
+    con.execute("""
+        INSERT INTO tbl_diseases BY NAME
+        SELECT d.*,
+            coalesce(p.ids, []) AS parents, coalesce(c.ids, []) AS children,
+            coalesce(a.ids, []) AS ancestors, coalesce(s.ids, []) AS descendants,
+            coalesce(a.roots, [d.id]) AS therapeuticAreas
+        FROM df_diseases d
+        LEFT JOIN (SELECT child AS id, list(parent ORDER BY parent) AS ids FROM df_edges GROUP BY 1) p ON p.id = d.id
+        LEFT JOIN (SELECT parent AS id, list(child ORDER BY child) AS ids FROM df_edges GROUP BY 1) c ON c.id = d.id
+        LEFT JOIN (
+            SELECT descendant AS id, list(ancestor ORDER BY ancestor) AS ids,
+                list(ancestor ORDER BY ancestor) FILTER (WHERE ancestor NOT IN (SELECT child FROM df_edges)) AS roots
+            FROM tmp_ancestors GROUP BY 1
+        ) a ON a.id = d.id
+        LEFT JOIN (SELECT ancestor AS id, list(descendant ORDER BY descendant) AS ids FROM tmp_ancestors GROUP BY 1) s ON s.id = d.id
+        ORDER BY d.id
+    """)
+    con.unregister("df_diseases")
+    con.unregister("df_edges")
+    con.execute("DROP TABLE tmp_ancestors")
+    print(f"tbl_diseases: {len(df)} rows, {len(edges)} parent links")
+    return ids
+
+
+def generate_actions(con, rng, molecule_ids, target_ids, target_p, args):
+    """Mechanisms of action of a share of the molecules, with their references."""
+    has_mechanism = np.flatnonzero(rng.random(len(molecule_ids)) < args.mechanism_fraction)
+    counts = counts_per_item(rng, len(has_mechanism), args.actions_per_molecule)
+    items, targets = sample_links(rng, len(has_mechanism), counts, len(target_ids), target_p)
+    molecules = molecule_ids[has_mechanism[items]]
+    action_types = choice(rng, args.action_types, len(items))
+    action_ids = molecules + "_" + target_ids[targets]
+    df = pd.DataFrame({
+        "action_id": action_ids,
+        "ChEMBL_id": molecules,
+        "target_id": target_ids[targets],
+        "actionType": action_types,
+        "mechanismOfAction": [f"Synthetic {action_type.lower()}" for action_type in action_types],
+    })
+    insert(con, "tbl_actions", df)
+
+    n_refs = rng.integers(0, 3, size=len(df))
+    ref_actions = np.repeat(np.arange(len(df)), n_refs)
+    refs = pd.DataFrame({
+        "action_id": action_ids[ref_actions],
+        "ref_source": choice(rng, dict.fromkeys(REF_SOURCES, 1), len(ref_actions)),
+    }).drop_duplicates()
+    refs["ref_data"] = [[f"https://example.org/{source}/{i}"] for i, source in enumerate(refs.ref_source)]
+    insert(con, "tbl_refs", refs)
+    # molecule -> its targets, for the known drug rows
+    return df.groupby("ChEMBL_id").target_id.apply(list).to_dict()
+
+
+def generate_disease_targets(con, rng, disease_ids, target_ids, target_p, args):
+    counts = counts_per_item(rng, len(disease_ids), args.targets_per_disease)
+    items, targets = sample_links(rng, len(disease_ids), counts, len(target_ids), target_p)
+    insert(con, "tbl_disease_target", pd.DataFrame({"disease_id": disease_ids[items], "target_id": target_ids[targets]}))
+
+
+def generate_known_drugs(con, rng, molecule_ids, molecule_phases, molecule_targets, disease_ids, target_ids, n_rows: int, args):
+    """Known drug rows (drug, target, disease, phase, status, urls), more of them for the advanced molecules."""
+    drug_p = molecule_phases / molecule_phases.sum()
+    drugs = rng.choice(len(molecule_ids), size=n_rows, p=drug_p)
+    diseases = rng.choice(len(disease_ids), size=n_rows, p=zipf_weights(len(disease_ids), args.disease_skew)[rng.permutation(len(disease_ids))])
+    phases = np.minimum(molecule_phases[drugs], rng.choice([1.0, 2.0, 3.0, 4.0], size=n_rows, p=[0.25, 0.35, 0.2, 0.2]))
+    has_urls = rng.random(n_rows) < args.url_fraction
+    drug_ids = molecule_ids[drugs]
+    targets = [
+        (molecule_targets[drug_id][i % len(molecule_targets[drug_id])] if drug_id in molecule_targets else target_ids[i % len(target_ids)])
+        for i, drug_id in zip(rng.integers(0, 1 << 30, size=n_rows), drug_ids)
+    ]
+    df = pd.DataFrame({
+        "drugId": drug_ids,
+        "targetId": targets,
+        "diseaseId": disease_ids[diseases],
+        "phase": phases.astype(np.float32),
+        "status": choice(rng, STATUSES, n_rows),
+        "urls": [json.dumps([{"niceName": "ClinicalTrials", "url": f"https://clinicaltrials.gov/search?term=NCT{i:08d}"}]) if has_url else "[]"
+                 for i, has_url in enumerate(has_urls)],
+        "label": [f"synthetic disease {i}" for i in diseases],
+        "prefName": [f"SYNTHOMAB-{i}" for i in drugs],
+        "drugType": "Small molecule",
+    })
+    insert(con, "tbl_knownDrugsAggregated", df)
+    # the diseases linked to the molecules (as 0090 reads them from the molecule data)
+    con.execute("""
+        INSERT OR IGNORE INTO tbl_disease_substance
+        SELECT DISTINCT diseaseId, drugId FROM tbl_knownDrugsAggregated
+    """)
+    print(f"tbl_disease_substance: {con.execute('SELECT count(*) FROM tbl_disease_substance').fetchone()[0]} rows")
+
+
+def run_stage(script: str, db_path: str):
+    time_start = pd.Timestamp.now()
+    returncode = subprocess.run([sys.executable, "-u", script], env={**os.environ, ENV_DB_PATH: db_path}).returncode
+    elapsed = (pd.Timestamp.now() - time_start).total_seconds()
+    if returncode != 0:
+        print(f"❌ Error in {script} (exit code {returncode})")
+        sys.exit(returncode)
+    return elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generates a synthetic database with the schema of 0025_dbase_create.py.")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="database file (replaced if it exists)")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier of the molecules, diseases and known drug rows")
+    parser.add_argument("--molecules", type=int, default=18_000)
+    parser.add_argument("--targets", type=int, default=None, help="default: 20000 at any scale")
+    parser.add_argument("--diseases", type=int, default=28_000)
+    parser.add_argument("--known-drugs", type=int, default=250_000, help="rows of tbl_knownDrugsAggregated (density of the known drug data)")
+    parser.add_argument("--mechanism-fraction", type=float, default=0.4, help="share of the molecules with a mechanism of action")
+    parser.add_argument("--actions-per-molecule", type=float, default=1.6, help="mean number of targets of a molecule with a mechanism")
+    parser.add_argument("--targets-per-disease", type=float, default=25, help="mean number of targets of a disease (sparsity of the disease masks)")
+    parser.add_argument("--target-skew", type=float, default=1.1, help="Zipf exponent of the target popularity (0 = uniform)")
+    parser.add_argument("--disease-skew", type=float, default=0.8, help="Zipf exponent of the disease popularity in the known drug data")
+    parser.add_argument("--url-fraction", type=float, default=0.5, help="share of the known drug rows with urls")
+    parser.add_argument("--orphanet-fraction", type=float, default=0.3, help="share of the diseases with an Orphanet cross-reference")
+    parser.add_argument("--action-types", type=parse_distribution, default=DEFAULT_ACTION_TYPES,
+                        help="distribution of the action types, e.g. INHIBITOR=0.6,AGONIST=0.4")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tables-only", action="store_true", help="do not run the derived stages")
+    args = parser.parse_args()
+
+    n_molecules = int(args.molecules * args.scale)
+    n_diseases = int(args.diseases * args.scale)
+    n_known_drugs = int(args.known_drugs * args.scale)
+    n_targets = args.targets or 20_000
+
+    time_start = pd.Timestamp.now()
+    rng = np.random.default_rng(args.seed)
+
+    if os.path.exists(args.output):
+        os.remove(args.output)
+    shutil.rmtree(get_vector_store_dir(args.output), ignore_errors=True)
+    run_stage(SCHEMA_STAGE, args.output)
+
+    con = duckdb.connect(args.output)
+    target_ids = generate_targets(con, rng, n_targets)
+    target_p = zipf_weights(n_targets, args.target_skew)
+    molecule_ids, molecule_phases = generate_molecules(con, rng, n_molecules)
+    disease_ids = generate_diseases(con, rng, n_diseases, args.orphanet_fraction)
+    molecule_targets = generate_actions(con, rng, molecule_ids, target_ids, target_p, args)
+    generate_disease_targets(con, rng, disease_ids, target_ids, target_p, args)
+    generate_known_drugs(con, rng, molecule_ids, molecule_phases, molecule_targets, disease_ids, target_ids, n_known_drugs, args)
+    con.close()
+    print(f"✅ Synthetic tables generated in {args.output} in {pd.Timestamp.now() - time_start}")
+
+    if not args.tables_only:
+        stage_times = {}
+        os.makedirs("data_tmp", exist_ok=True)
+        for script in DERIVED_STAGES:
+            stage_times[script] = run_stage(script, args.output)
+        build_start = pd.Timestamp.now()
+        build_vector_store(args.output)
+        stage_times["vector store"] = (pd.Timestamp.now() - build_start).total_seconds()
+
+        print(f"\n{'stage':<60}{'time, s':>10}")
+        for script, elapsed in stage_times.items():
+            print(f"{script:<60}{elapsed:>10.1f}")
+
+    print(f"✅ Synthetic database {args.output} ready (scale {args.scale}: {n_molecules} molecules, {n_targets} targets, "
+          f"{n_diseases} diseases, {n_known_drugs} known drug rows)")
+    print(f"Time taken: {pd.Timestamp.now() - time_start}")
@@ -1,99 +1,91 @@
+"""
+This script is used to generate the IVPE table candidates (OUTPUT_DIR) for the cases of INPUT_DIR.
+The cases are scored in-process with the SimilarityService of the active release (see lib_utils/similarity_service.py),
+no server is needed.
+
+python 6050_generate_IVPE_table_candidates.py               # regenerate the cases whose input has changed
+python 6050_generate_IVPE_table_candidates.py --workers 8   # score the cases in 8 processes
+python 6050_generate_IVPE_table_candidates.py --force       # regenerate all the cases
+
+Case i (the i-th input file in sorted order) is written to ivpe_case_<i>.txt, whatever the number of workers.
+MANIFEST_FILE records the content hash of the input file of every generated case, together with the database fingerprint:
+a case is only regenerated if its input file, its position or the database has changed since the last run.
+"""
 import os
+import json
 import logging
+import argparse
 import datetime as dt
-import subprocess
-import time
-import socket
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from hashlib import md5
-import json
-import requests
 from tqdm import tqdm
 
+from lib_utils.release_config import get_active_db_path
+from lib_utils.similarity_service import SimilarityService
+
 
 INPUT_DIR = 'staging_area_01'
 OUTPUT_DIR = 'staging_area_02'
+MANIFEST_FILE = os.path.join(OUTPUT_DIR, '.ivpe_manifest.json')
+TOP_K = 10
+CASES_PER_TASK = 16  # cases of the same disease stay in one task, so their disease mask is computed once
 
-BASE_URL = 'http://127.0.0.1:7334'
 LOGS_DIR = "logs"
-SERVER_SCRIPT = "3015_server_full_scoring_optimised.py"  # Update with the actual filename
-SERVER_PORT = 7334  # Change this if your server uses a different port
-
-# Detect the local Python environment for both Windows and Linux
-if os.name == 'nt':  # Windows
-    VENV_PYTHON = os.path.join(os.getcwd(), "venv", "Scripts", "python.exe")
-else:  # Linux/Mac
-    VENV_PYTHON = os.path.join(os.getcwd(), "venv", "bin", "python")
-PYTHON_EXECUTABLE = VENV_PYTHON if os.path.exists(VENV_PYTHON) else "python3"
-
-# Ensure logs directory exists
-os.makedirs(LOGS_DIR, exist_ok=True)
-logging.basicConfig(
-    filename=os.path.join(LOGS_DIR, "test_" + dt.datetime.now().isoformat().replace(":", "-") + ".log"),
-    format="%(levelname)s: %(message)s",
-    level=logging.DEBUG,
-)
-
-def start_server():
-    """Start the server as a subprocess using the local Python environment."""
-    logging.info(f"Starting the server using {PYTHON_EXECUTABLE}...")
-    
-    log_file_path = os.path.join(LOGS_DIR, "server_output.log")
-    with open(log_file_path, "w") as log_file:
-        server_process = subprocess.Popen(
-            [PYTHON_EXECUTABLE, SERVER_SCRIPT],
-            stdout=log_file,
-            stderr=subprocess.STDOUT,
-            env={**os.environ, "PATH": os.path.dirname(PYTHON_EXECUTABLE) + os.pathsep + os.environ["PATH"]}  # Ensure virtual environment is used
-        )
-    
-    return server_process
-
-def is_port_open(port, host="127.0.0.1"):
-    """Check if a specific port is open."""
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        s.settimeout(1)  # Set a short timeout
-        return s.connect_ex((host, port)) == 0
-
-def wait_for_server():
-    """Wait until the server starts by checking if the port is open."""
-    logging.info("Waiting for the server to start...")
-
-    for _ in range(30):  # Try for up to 30 seconds
-        if is_port_open(SERVER_PORT):
-            logging.info("Server is up and running.")
-            return True
-        time.sleep(1)
-    
-    logging.error("Server failed to start in time.")
-
-    # Print server logs for debugging
-    log_file_path = os.path.join(LOGS_DIR, "server_output.log")
-    with open(log_file_path, "r") as log_file:
-        print("===== SERVER LOG OUTPUT =====")
-        print(log_file.read())
-        print("============================")
-    
-    return False
-
-# Start the server
-server_process = start_server()
-if not wait_for_server():
-    logging.error("Server did not start. Exiting.")
-    exit(1)
-else:
-    logging.info("Server started successfully.")
-
-for i, fname in enumerate(tqdm([fname for fname in sorted(os.listdir(INPUT_DIR)) if fname.endswith('.txt')]), 1):
-    with open(os.path.join(INPUT_DIR, fname)) as f:
-        text = f.read()
-    disease_id, reference_chembl_id = next(row for row in text.split('\n') if row.strip() and not row.startswith('#')).strip().split()[:2]
-
-    logging.info(f"generate candidates for {disease_id} - {reference_chembl_id}")
-
-    disease_name = requests.get(f'{BASE_URL}/diseases/{disease_id}').json()['name']
-    res = requests.get(f'{BASE_URL}/disease_chembl_similarity/{disease_id}/{reference_chembl_id}?top_k=10')
-    res_json = res.json()
 
+_service = None  # service of a worker process
+
+
+def read_cases():
+    """Returns (input file, content hash, disease_id, reference_chembl_id) of every input file, in sorted order."""
+    cases = []
+    for fname in [fname for fname in sorted(os.listdir(INPUT_DIR)) if fname.endswith('.txt')]:
+        with open(os.path.join(INPUT_DIR, fname), 'rb') as f:
+            data = f.read()
+        text = data.decode('utf-8')
+        disease_id, chembl_id = next(row for row in text.split('\n') if row.strip() and not row.startswith('#')).strip().split()[:2]
+        cases.append((fname, md5(data).hexdigest(), disease_id, chembl_id))
+    return cases
+
+
+def get_output_name(i: int):
+    return f'ivpe_case_{i:0>3}.txt'
+
+
+def init_worker(db_path: str):
+    global _service
+    _service = SimilarityService(db_path, pool_size=1)
+
+
+def iter_scores(service: SimilarityService, cases: list):
+    """Scores the (index, disease_id, chembl_id) cases, yields (index, result, error) for every case."""
+    results = service.disease_chembl_similarity_batch([(disease_id, chembl_id) for _, disease_id, chembl_id in cases], top_k=TOP_K)
+    for i, _, _, result, error in results:
+        yield cases[i][0], result, None if error is None else repr(error)
+
+
+def score_cases(cases: list):
+    """Task of a worker process."""
+    return list(iter_scores(_service, cases))
+
+
+def make_tasks(cases: list, n_workers: int):
+    """Splits the (index, disease_id, chembl_id) cases into tasks, the cases of a disease in the same task."""
+    by_disease = {}
+    for case in cases:
+        by_disease.setdefault(case[1], []).append(case)
+    task_size = max(1, min(CASES_PER_TASK, len(cases) // n_workers))
+    tasks, task = [], []
+    for disease_cases in by_disease.values():
+        task.extend(disease_cases)
+        if len(task) >= task_size:
+            tasks.append(task)
+            task = []
+    if task:
+        tasks.append(task)
+    return tasks
+
+
+def format_candidates(disease_id: str, disease_name: str, population: int, reference_chembl_id: str, res_json: dict):
     results = []
     for p in ('primary', 'secondary'):
         for row in res_json[f'similar_drugs_{p}']:
@@ -101,19 +93,96 @@ for i, fname in enumerate(tqdm([fname for fname in sorted(os.listdir(INPUT_DIR))
                 'similarity': row['Similarity'],
                 'disease_id': disease_id,
                 'disease_name': disease_name,
-                'reference_drug_id': reference_chembl_id, 
+                'reference_drug_id': reference_chembl_id,
                 'reference_drug_name': res_json['reference_drug']['Molecule Name'],
-                'substitute_drug_id': row['ChEMBL ID'], 
+                'substitute_drug_id': row['ChEMBL ID'],
                 'substitute_drug_name': row['Molecule Name'],
-                'global_patient_population': 'N/A',
+                'global_patient_population': 'N/A' if population is None else population,
                 'cost_difference': 'N/A',
                 'evidence': f'Phase {row["phase"]} (phase status: {row["status"]})' if row["phase"] else 'N/A',
                 'annual_cost_reduction': 'N/A',
             }
             results.append('\n'.join(f'{k}: {v}' for k, v in result.items()))
-    with open(os.path.join(OUTPUT_DIR, f'ivpe_case_{i:0>3}.txt'), 'w', encoding='utf-8') as f:
-        f.write('\n\n'.join(results))
-
-# Cleanup: Stop the server
-server_process.terminate()
-logging.info("Server terminated.")
\ No newline at end of file
+    return '\n\n'.join(results)
+
+
+if __name__ == "__main__":  # the worker processes import this module again
+    parser = argparse.ArgumentParser(description="Generates the IVPE table candidates of the input cases.")
+    parser.add_argument("--workers", type=int, default=1, help="processes scoring the cases (1: in this process)")
+    parser.add_argument("--force", action="store_true", help="regenerate all the cases, not only the changed ones")
+    args = parser.parse_args()
+
+    # Ensure logs directory exists
+    os.makedirs(LOGS_DIR, exist_ok=True)
+    logging.basicConfig(
+        filename=os.path.join(LOGS_DIR, "test_" + dt.datetime.now().isoformat().replace(":", "-") + ".log"),
+        format="%(levelname)s: %(message)s",
+        level=logging.DEBUG,
+    )
+
+    db_path = get_active_db_path()
+    service = SimilarityService(db_path)
+
+    manifest = {}
+    if os.path.exists(MANIFEST_FILE) and not args.force:
+        with open(MANIFEST_FILE) as f:
+            manifest = json.load(f)
+
+    # a case is up to date if it was generated from the same input file content and database
+    cases = read_cases()
+    entries = {
+        get_output_name(i): {'input': fname, 'hash': content_hash, 'db': service.fingerprint}
+        for i, (fname, content_hash, _, _) in enumerate(cases, 1)
+    }
+    todo = [
+        (i, disease_id, chembl_id) for i, (_, _, disease_id, chembl_id) in enumerate(cases, 1)
+        if manifest.get(get_output_name(i)) != entries[get_output_name(i)] or not os.path.exists(os.path.join(OUTPUT_DIR, get_output_name(i)))
+    ]
+    print(f"{len(cases)} cases, {len(cases) - len(todo)} up to date, {len(todo)} to generate")
+
+    # the outputs of the removed cases
+    for output_name in set(manifest) - set(entries):
+        if os.path.exists(os.path.join(OUTPUT_DIR, output_name)):
+            os.remove(os.path.join(OUTPUT_DIR, output_name))
+        del manifest[output_name]
+
+    with service.pool.cursor() as conn:
+        disease_ids = sorted({disease_id for _, disease_id, _ in todo})
+        disease_names = dict(conn.execute("SELECT id, name FROM tbl_diseases WHERE id IN (SELECT unnest(?::STRING[]))", [disease_ids]).fetchall())
+        # Orphanet prevalence, if the database has it (see 0150)
+        populations = {disease_id: row['population'] for disease_id, row in service.disease_prevalences(disease_ids, conn).items()}
+
+    def write_case(i: int, result: dict, error: str):
+        output_name = get_output_name(i)
+        disease_id, reference_chembl_id = cases[i - 1][2:]
+        logging.info(f"generate candidates for {disease_id} - {reference_chembl_id}")
+        if error is not None:
+            logging.error(f"no candidates for {disease_id} - {reference_chembl_id}: {error}")
+            manifest.pop(output_name, None)
+            if os.path.exists(os.path.join(OUTPUT_DIR, output_name)):
+                os.remove(os.path.join(OUTPUT_DIR, output_name))
+            return
+        with open(os.path.join(OUTPUT_DIR, output_name), 'w', encoding='utf-8') as f:
+            f.write(format_candidates(disease_id, disease_names.get(disease_id), populations.get(disease_id), reference_chembl_id, result))
+        manifest[output_name] = entries[output_name]
+
+    try:
+        with tqdm(total=len(todo), desc="Generating cases") as pbar:
+            if args.workers <= 1:
+                # all the cases are scored in one batch, grouped by disease
+                for i, result, error in iter_scores(service, todo):
+                    write_case(i, result, error)
+                    pbar.update(1)
+            else:
+                with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker, initargs=(db_path,)) as executor:
+                    futures = [executor.submit(score_cases, task) for task in make_tasks(todo, args.workers)]
+                    for future in as_completed(futures):
+                        for i, result, error in future.result():
+                            write_case(i, result, error)
+                            pbar.update(1)
+    finally:
+        # the cases generated so far are not regenerated by the next run
+        with open(MANIFEST_FILE, 'w') as f:
+            json.dump(dict(sorted(manifest.items())), f, indent=2)
+
+    print(f"✅ IVPE table candidates saved in {OUTPUT_DIR}")
@@ -0,0 +1,96 @@
+"""
+This script is used to score the IVPE table candidates of INPUT_DIR (generated by 6050, unneeded candidates removed)
+and to write the ranked IVPE table to OUTPUT_DIR, served by /table_ivpe_ranked (see lib_utils/ivpe_scoring.py).
+
+python 6060_score_IVPE_table_candidates.py
+
+The global patient population of a disease is estimated from the Orphanet point prevalence of its cross-references
+(tbl_disease_prevalence, see 0150_dbase_disease_prevalence_create.py); the cost difference is the difference of the annual costs
+per patient of the reference and substitute drugs in COSTS_FILE. Values already given in a candidate are kept.
+Candidate i of the ranking is written to ivpe_rank_<i>.txt. The new ranking is written to a temporary directory
+that replaces OUTPUT_DIR once complete, so the server never loads a partial ranking.
+"""
+import os
+import glob
+import shutil
+
+import duckdb
+import pandas as pd
+
+from lib_utils.ivpe_scoring import format_candidate, score_candidates
+from lib_utils.ivpe_table import parse_candidate
+from lib_utils.release_config import get_active_db_path
+
+
+INPUT_DIR = 'staging_area_02'
+OUTPUT_DIR = 'staging_area_04'
+OUTPUT_PREFIX = 'ivpe_rank_'
+COSTS_FILE = os.path.join('staging_area_03', 'drug_costs.csv')  # chembl_id, annual_cost (USD per patient and year)
+
+
+def read_candidates():
+    """Returns the candidates of the input files (blocks of "column: value" lines separated by empty lines)."""
+    candidates = []
+    for fname in sorted(glob.glob(os.path.join(INPUT_DIR, '*.txt'))):
+        with open(fname, encoding='utf-8') as f:
+            blocks = f.read().split('\n\n')
+        for block in blocks:
+            candidate = {k.strip(): v.strip() for k, v in parse_candidate(block).items()}
+            if candidate:
+                candidates.append(candidate)
+    return pd.DataFrame(candidates)
+
+
+def get_populations(conn: duckdb.DuckDBPyConnection, disease_ids: list):
+    """Returns the global patient population of the diseases with an Orphanet prevalence (tbl_disease_prevalence, see 0150)."""
+    tables = {row[0] for row in conn.execute("SELECT table_name FROM information_schema.tables").fetchall()}
+    if 'tbl_disease_prevalence' not in tables:
+        print("⚠️ No disease prevalence (tbl_disease_prevalence), run 0145_xml_orpha_net_prevalence_injest.py and 0150_dbase_disease_prevalence_create.py")
+        return pd.DataFrame({'disease_id': [], 'population': []})
+    return conn.execute(
+        "SELECT disease_id, population FROM tbl_disease_prevalence WHERE disease_id IN (SELECT unnest(?::STRING[]))", [disease_ids]
+    ).df()
+
+
+if __name__ == "__main__":
+    time_start = pd.Timestamp.now()
+
+    candidates = read_candidates()
+    if candidates.empty:
+        print(f"❌ No candidates in {INPUT_DIR}, run 6050_generate_IVPE_table_candidates.py")
+        exit(1)
+
+    conn = duckdb.connect(get_active_db_path(), read_only=True)
+    populations = get_populations(conn, sorted(candidates['disease_id'].unique()))
+    conn.close()
+
+    if os.path.exists(COSTS_FILE):
+        costs = pd.read_csv(COSTS_FILE, dtype={'chembl_id': str}, usecols=['chembl_id', 'annual_cost'])
+    else:
+        print(f"⚠️ No drug costs ({COSTS_FILE}), the cost differences of the candidates are used")
+        costs = pd.DataFrame({'chembl_id': [], 'annual_cost': []})
+
+    scored = score_candidates(candidates, populations, costs)
+
+    tmp_dir = f"{OUTPUT_DIR}.tmp-{os.getpid()}"
+    os.makedirs(tmp_dir)
+    if os.path.exists(os.path.join(OUTPUT_DIR, 'README.md')):
+        shutil.copy(os.path.join(OUTPUT_DIR, 'README.md'), tmp_dir)
+    width = max(3, len(str(len(scored))))
+    for row in scored.to_dict('records'):
+        with open(os.path.join(tmp_dir, f"{OUTPUT_PREFIX}{row['rank']:0>{width}}.txt"), 'w', encoding='utf-8') as f:
+            f.write(format_candidate(row))
+    # swap: the server keeps the loaded ranking while OUTPUT_DIR is missing (see lib_utils/ivpe_table.py)
+    old_dir = f"{OUTPUT_DIR}.old-{os.getpid()}"
+    if os.path.exists(OUTPUT_DIR):
+        os.rename(OUTPUT_DIR, old_dir)
+    os.rename(tmp_dir, OUTPUT_DIR)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+    print(scored[['rank', 'disease_id', 'reference_drug_id', 'substitute_drug_id', 'global_patient_population',
+                  'cost_difference', 'evidence_probability', 'annual_cost_reduction']].head(10).to_string(index=False))
+    print(f"{scored['annual_cost_reduction'].notna().sum()} of {len(scored)} candidates scored")
+    print(f"✅ IVPE table saved in {OUTPUT_DIR}")
+
+    time_end = pd.Timestamp.now()
+    print(f"Time taken: {time_end - time_start}")
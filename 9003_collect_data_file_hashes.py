@@ -1,6 +1,8 @@
 import os
 import re
 
+from lib_utils.release_config import get_release_config
+
 def collect_sha1_hashes(root_folder, output_file):
     hash_data = []
     
@@ -37,6 +39,6 @@ def collect_sha1_hashes(root_folder, output_file):
     print(f"SHA1 hashes collected and saved to {output_file}")
 
 if __name__ == "__main__":
-    root_folder = "./data/202409XX/"
+    root_folder = get_release_config().data_dir
     output_file = "sha1_hashes.tsv"
     collect_sha1_hashes(root_folder, output_file)
@@ -0,0 +1,94 @@
+"""
+In-memory prefix index for the /autocomplete endpoint.
+
+Every name, trade name and synonym of the molecules and every name and synonym of the diseases is a term;
+the lower-cased terms are kept in one sorted array, so the terms starting with a prefix are a contiguous range found by bisection.
+The matches are ranked by: exact match, approval, phase (max clinical trial phase for the molecules,
+max phase of the known drugs for the diseases), shorter term.
+"""
+import json
+from bisect import bisect_left
+
+import duckdb
+import numpy as np
+
+
+ENTITY_TYPES = ("molecule", "disease")
+MAX_TERM_LENGTH = 999  # longer terms are ranked as this long
+
+
+class AutocompleteIndex:
+
+    def __init__(self, entries: list):
+        """entries: (term, entity type, id, display name, approved, phase) tuples."""
+        entries = sorted(((term.lower(), term, *rest) for term, *rest in entries if term), key=lambda entry: entry[0])
+        self.keys = [entry[0] for entry in entries]
+        self.terms = [entry[1] for entry in entries]
+        self.types = np.array([ENTITY_TYPES.index(entry[2]) for entry in entries], dtype=np.int8)
+        self.ids = [entry[3] for entry in entries]
+        self.names = [entry[4] for entry in entries]
+        self.approved = np.array([bool(entry[5]) for entry in entries], dtype=bool)
+        self.phases = np.array([entry[6] or 0 for entry in entries], dtype=np.float32)
+        self.lengths = np.minimum([len(key) for key in self.keys], MAX_TERM_LENGTH).astype(np.int32)
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def from_db(cls, conn: duckdb.DuckDBPyConnection):
+        entries = []
+        query = "SELECT id, name, tradeNames, synonyms, isApproved, maximumClinicalTrialPhase FROM tbl_molecules"
+        for chembl_id, name, trade_names, synonyms, is_approved, phase in conn.execute(query).fetchall():
+            display_name = name or chembl_id
+            for term in {name, *(trade_names or []), *(synonyms or [])}:
+                entries.append((term, "molecule", chembl_id, display_name, is_approved, phase))
+
+        query = """
+            SELECT d.id, d.name, d.synonyms, max(kda.phase)
+            FROM tbl_diseases d
+            LEFT JOIN tbl_knownDrugsAggregated kda ON kda.diseaseId = d.id
+            GROUP BY ALL
+        """
+        for disease_id, name, synonyms, phase in conn.execute(query).fetchall():
+            display_name = name or disease_id
+            # synonyms: JSON object of synonym lists by relation, e.g. {"hasExactSynonym": [...]}
+            synonyms = [synonym for values in json.loads(synonyms or "{}").values() for synonym in values]
+            for term in {name, *synonyms}:
+                entries.append((term, "disease", disease_id, display_name, False, phase))
+        return cls(entries)
+
+    def complete(self, prefix: str, limit: int = 10, entity_type: str = None):
+        """Returns up to limit distinct entities with a term starting with the prefix, best first."""
+        key = prefix.strip().lower()
+        if not key:
+            return []
+        start = bisect_left(self.keys, key)
+        end = bisect_left(self.keys, key + "\U0010ffff", start)
+        candidates = np.arange(start, end)
+        if entity_type is not None:
+            candidates = candidates[self.types[start:end] == ENTITY_TYPES.index(entity_type)]
+        if not len(candidates):
+            return []
+
+        # one sort key: exact match, approved, phase, then shorter terms first
+        exact = self.lengths[candidates] == len(key)
+        rank = (exact * 100 + self.approved[candidates] * 10 + self.phases[candidates]) * (MAX_TERM_LENGTH + 1) - self.lengths[candidates]
+        # entities can match with several terms, so a few more candidates than needed are ranked first
+        n_best = min(len(candidates), limit * 8)
+        if n_best < len(candidates):
+            best = np.argpartition(-rank, n_best - 1)[:n_best]
+            results = self._take(candidates, best[np.lexsort((candidates[best], -rank[best]))], limit)
+            if len(results) == limit:
+                return results
+        return self._take(candidates, np.lexsort((candidates, -rank)), limit)
+
+    def _take(self, candidates: np.ndarray, order: np.ndarray, limit: int):
+        results, seen = [], set()
+        for i in candidates[order]:
+            if self.ids[i] in seen:
+                continue
+            seen.add(self.ids[i])
+            results.append({"id": self.ids[i], "name": self.names[i], "type": ENTITY_TYPES[self.types[i]], "match": self.terms[i]})
+            if len(results) == limit:
+                break
+        return results
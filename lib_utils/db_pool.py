@@ -0,0 +1,32 @@
+import os
+import queue
+from contextlib import contextmanager
+
+import duckdb
+
+
+DEFAULT_POOL_SIZE = int(os.environ.get("AFFORDABLE_DB_POOL_SIZE", 8))
+
+
+class CursorPool:
+    """
+    Fixed-size pool of cursors opened on a single read-only DuckDB connection.
+    Every cursor has its own result set and description, so the cursors can be used from different threads at the same time.
+    """
+
+    def __init__(self, db_path: str, size: int = DEFAULT_POOL_SIZE):
+        self.db_path = db_path
+        self.size = size
+        self.conn = duckdb.connect(db_path, read_only=True)
+        self._cursors = queue.LifoQueue()
+        for _ in range(size):
+            self._cursors.put(self.conn.cursor())
+
+    @contextmanager
+    def cursor(self, timeout: float = None):
+        """Borrows a cursor, waiting for a free one if all of them are in use."""
+        cur = self._cursors.get(timeout=timeout)
+        try:
+            yield cur
+        finally:
+            self._cursors.put(cur)
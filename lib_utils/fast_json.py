@@ -0,0 +1,29 @@
+"""
+Fast JSON responses for the server: orjson when it is installed, the standard library otherwise.
+Returning a FastJSONResponse from an endpoint also skips the response model validation and jsonable_encoder,
+so the content must be made of JSON types (values of other types go through jsonable_encoder one by one).
+"""
+import json
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from lib_utils.metrics import span
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+def dumps(obj):
+    """Serializes to compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=jsonable_encoder, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=jsonable_encoder).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        with span("json"):
+            return dumps(content)
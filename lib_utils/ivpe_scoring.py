@@ -0,0 +1,101 @@
+"""
+Scoring of the IVPE table candidates (see README, Affordable IVPE Table):
+
+    annual cost reduction = global patient population × cost difference × evidence probability
+
+The evidence of a candidate is mapped to a probability with the hierarchy of evidence of the README
+(e.g. "0.6: Phase 2 RCTs", "Prospective Studies (Single-Arm)", +0.1 for superiority evidence);
+the evidence written by 6050 ("Phase 3.0 (phase status: Completed)") is mapped by its clinical trial phase.
+All the candidates are scored and ranked at once with column operations on a DataFrame.
+"""
+import numpy as np
+import pandas as pd
+
+
+WORLD_POPULATION = 8_000_000_000
+
+# hierarchy of evidence of the README, weakest first (the strongest study type found in the evidence is used)
+EVIDENCE_HIERARCHY = {
+    "animal stud": 0.1,
+    "case stud": 0.2,
+    "retrospective stud": 0.3,
+    "rct emulation": 0.4,
+    "prospective stud": 0.5,
+    "phase 2 rct": 0.6,
+    "phase 3 rct": 0.7,
+    "pre-approval systematic review": 0.8,
+    "clinical guideline": 0.9,
+    "fda approval": 0.9,
+    "post-approval systematic review": 1.0,
+}
+SUPERIORITY_BONUS = 0.1
+# max clinical trial phase of the substitute drug for the disease -> study type of the hierarchy
+# (phase 4: approved, phase 1 and early phase 1: single-arm prospective studies)
+CLINICAL_PHASE_PROBABILITIES = {4.0: 0.9, 3.0: 0.7, 2.0: 0.6, 1.0: 0.5, 0.5: 0.5}
+
+# columns of the scored table, in the order of the IVPE table files (see staging_area_03/README.md)
+COLUMNS = [
+    "similarity", "disease_id", "disease_name", "reference_drug_id", "reference_drug_name",
+    "substitute_drug_id", "substitute_drug_name", "global_patient_population", "cost_difference", "evidence",
+    "annual_cost_reduction", "evidence_probability", "rank",
+]
+
+
+def to_numbers(values: pd.Series):
+    """Column values to numbers, e.g. "0.87" or "$1,200,000"; NaN if not a number (e.g. N/A)."""
+    text = values.astype("string").str.strip().str.lstrip("$").str.replace(",", "", regex=False)
+    return pd.to_numeric(text, errors="coerce").astype(float)
+
+
+def get_evidence_probabilities(evidence: pd.Series):
+    """Evidence probability of every evidence text, NaN if the evidence is unknown."""
+    text = evidence.fillna("").astype(str).str.strip().str.lower()
+    phase = pd.to_numeric(text.str.extract(r"^phase\s+(\d*\.?\d+)", expand=False), errors="coerce")
+    probability = phase.map(CLINICAL_PHASE_PROBABILITIES)
+    for study_type, score in EVIDENCE_HIERARCHY.items():
+        probability = probability.mask(text.str.contains(study_type, regex=False), score)
+    probability = probability + text.str.contains("superiority", regex=False) * SUPERIORITY_BONUS
+    # an explicit score, e.g. "0.7: Phase 3 RCTs", already includes the bonus
+    explicit = pd.to_numeric(text.str.extract(r"^(\d*\.?\d+)\s*:", expand=False), errors="coerce")
+    return explicit.fillna(probability).clip(upper=1.0)
+
+
+def score_candidates(candidates: pd.DataFrame, populations: pd.DataFrame, costs: pd.DataFrame):
+    """
+    Scores and ranks the candidates (columns of the IVPE table, text values).
+
+    populations: disease_id, population (global patient population of the disease)
+    costs: chembl_id, annual_cost (annual cost of the drug per patient)
+
+    The population and the cost difference of a candidate are only looked up if they are not given (N/A).
+    Returns the candidates with the numeric columns of COLUMNS, ranked by annual cost reduction
+    (the candidates that cannot be scored come last), then by evidence probability and similarity.
+    """
+    scored = candidates.copy()
+
+    population = scored["disease_id"].map(populations.set_index("disease_id")["population"])
+    scored["global_patient_population"] = to_numbers(scored["global_patient_population"]).fillna(population)
+
+    annual_cost = costs.set_index("chembl_id")["annual_cost"]
+    cost_difference = scored["reference_drug_id"].map(annual_cost) - scored["substitute_drug_id"].map(annual_cost)
+    scored["cost_difference"] = to_numbers(scored["cost_difference"]).fillna(cost_difference)
+
+    scored["evidence_probability"] = get_evidence_probabilities(scored["evidence"])
+    scored["annual_cost_reduction"] = scored["global_patient_population"] * scored["cost_difference"] * scored["evidence_probability"]
+
+    # one stable sort per key, least significant first (NaN last in every sort)
+    order = np.arange(len(scored))
+    for key in (to_numbers(scored["similarity"]), scored["evidence_probability"], scored["annual_cost_reduction"]):
+        order = order[np.argsort(-key.to_numpy()[order], kind="stable")]
+    scored = scored.iloc[order].reset_index(drop=True)
+    scored["rank"] = np.arange(1, len(scored) + 1)
+    return scored[COLUMNS]
+
+
+def format_candidate(row: dict):
+    """Text of a scored candidate, in the format of the IVPE table files."""
+    values = dict(row)
+    for column in ("global_patient_population", "cost_difference", "annual_cost_reduction"):
+        values[column] = "N/A" if pd.isna(values[column]) else f"{values[column]:.0f}"
+    values["evidence_probability"] = "N/A" if pd.isna(values["evidence_probability"]) else f"{values['evidence_probability']:.2f}"
+    return "\n".join(f"{column}: {values[column]}" for column in COLUMNS) + "\n"
@@ -0,0 +1,83 @@
+"""
+In-memory index of the IVPE table for the /table_ivpe endpoint.
+
+The table is the sequence of the .txt files of a directory in sorted order, one candidate per file
+(see staging_area_03/README.md). The files are parsed once; every request only compares the stat signature of the directory
+(mtime of the directory, name, mtime and size of every .txt file) with the signature of the loaded table,
+and the table is reloaded if it has changed.
+The candidates are indexed by disease_id, and the numeric values of the sortable columns are parsed at load time.
+"""
+import os
+import threading
+
+
+SORT_COLUMNS = ("similarity", "annual_cost_reduction", "global_patient_population", "cost_difference", "evidence_probability", "rank")
+
+
+def parse_candidate(text: str):
+    """Returns the columns of a candidate file; the lines starting with # and the empty lines are ignored."""
+    return dict(line.split(':', 1) for line in text.split('\n') if line.strip() and not line.strip().startswith('#'))
+
+
+def parse_number(value):
+    """Returns the number of a column value, e.g. " 0.87" or " $1,200,000", None if it is not a number (e.g. N/A)."""
+    try:
+        return float(str(value).strip().lstrip('$').replace(',', ''))
+    except ValueError:
+        return None
+
+
+class IvpeTable:
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        # (signature, candidates, disease_id -> positions of its candidates, column -> numeric value of every candidate),
+        # replaced as a whole on reload, so a request sees either the old or the new table
+        self.table = (None, [], {}, {})
+        self.lock = threading.Lock()
+
+    def get_signature(self):
+        entries = sorted(
+            (entry.name, entry.stat().st_mtime_ns, entry.stat().st_size)
+            for entry in os.scandir(self.directory) if entry.name.endswith('.txt') and entry.is_file()
+        )
+        return os.stat(self.directory).st_mtime_ns, tuple(entries)
+
+    def load(self, signature):
+        candidates = []
+        for fname, _, _ in signature[1]:
+            with open(os.path.join(self.directory, fname)) as f:
+                candidates.append(parse_candidate(f.read()))
+        by_disease = {}
+        for i, candidate in enumerate(candidates):
+            by_disease.setdefault(candidate.get('disease_id', '').strip(), []).append(i)
+        sort_values = {column: [parse_number(candidate.get(column)) for candidate in candidates] for column in SORT_COLUMNS}
+        self.table = (signature, candidates, by_disease, sort_values)
+
+    def refresh(self):
+        """
+        Reloads the table if the files of the directory have changed since the last load, returns the table.
+        The loaded table is kept while the directory is missing, e.g. replaced by a new one (see 6060).
+        """
+        try:
+            signature = self.get_signature()
+            if signature != self.table[0]:
+                with self.lock:
+                    if signature != self.table[0]:
+                        self.load(signature)
+        except FileNotFoundError:
+            pass
+        return self.table
+
+    def query(self, disease_id: str = None, sort_by: str = None, descending: bool = True):
+        """
+        Returns the candidates, in file order or sorted by a column of SORT_COLUMNS
+        (ties keep the file order, the candidates without a numeric value come last).
+        """
+        _, candidates, by_disease, sort_values = self.refresh()
+        positions = range(len(candidates)) if disease_id is None else by_disease.get(disease_id, [])
+        if sort_by is not None:
+            values = sort_values[sort_by]
+            sign = -1 if descending else 1
+            positions = sorted(positions, key=lambda i: (values[i] is None, sign * (values[i] or 0)))
+        return [candidates[i] for i in positions]
@@ -0,0 +1,70 @@
+"""
+Summary of the known drug data (tbl_knownDrugsAggregated) of a (drug, disease) pair, as used to rank the similar drugs:
+    max_phase    highest clinical trial phase
+    best_status  best trial status (see STATUS_NUM) among the rows of the highest phase, 'N/A' if unknown
+    status_num   rank of best_status
+    has_urls     whether any row has urls
+tbl_known_drug_summary (built by 0105_dbase_known_drug_summary_create.py) holds one precomputed row per pair.
+"""
+
+
+STATUS_NUM = {
+    'Active, not recruiting': 4,
+    'Completed': 5,
+    'Enrolling by invitation': 3,
+    'Not yet recruiting': 1,
+    'Recruiting': 2,
+    'Suspended': 0,
+    'Terminated': 0,
+    'Unknown status': 0,
+    'Withdrawn': 0,
+    'N/A': 0,
+}
+
+# a pair without known drug data
+NO_KNOWN_DRUG_SUMMARY = (0, 'N/A', 0, False)
+
+
+def summarize_known_drugs(rows: list):
+    """Returns (max_phase, best_status, status_num, has_urls) of the tbl_knownDrugsAggregated rows (dicts) of a pair."""
+    if not rows:
+        return NO_KNOWN_DRUG_SUMMARY
+    has_urls = any(row['urls'] for row in rows)
+    max_phase = max(row['phase'] for row in rows)
+    # ties: the first row in table order wins
+    best_status = max((row['status'] for row in rows if row['phase'] == max_phase), key=lambda x: STATUS_NUM.get(x, 0))
+    if best_status is None:
+        best_status = 'N/A'
+    return max_phase, best_status, STATUS_NUM[best_status], has_urls
+
+
+def build_known_drug_summary(con):
+    """(Re)creates tbl_known_drug_summary with the same rules as summarize_known_drugs()."""
+    status_values = ", ".join(f"('{status}', {num})" for status, num in STATUS_NUM.items())
+    con.execute("DROP TABLE IF EXISTS tbl_known_drug_summary")
+    con.execute(f"""
+        CREATE TABLE tbl_known_drug_summary AS
+        WITH status_num(status, status_num) AS (VALUES {status_values}),
+        kda AS (
+            SELECT drugId, diseaseId, phase, status, urls, rowid AS row_order FROM tbl_knownDrugsAggregated
+        ),
+        pairs AS (
+            SELECT drugId, diseaseId, max(phase) AS max_phase, bool_or(coalesce(urls, '') <> '') AS has_urls
+            FROM kda
+            GROUP BY drugId, diseaseId
+        ),
+        best AS (
+            SELECT p.drugId, p.diseaseId, p.max_phase, p.has_urls,
+                list(k.status ORDER BY coalesce(s.status_num, 0) DESC, k.row_order)[1] AS best_status
+            FROM pairs p
+            JOIN kda k ON k.drugId = p.drugId AND k.diseaseId = p.diseaseId AND k.phase IS NOT DISTINCT FROM p.max_phase
+            LEFT JOIN status_num s ON s.status = k.status
+            GROUP BY ALL
+        )
+        SELECT b.drugId, b.diseaseId, b.max_phase, coalesce(b.best_status, 'N/A') AS best_status,
+            coalesce(s.status_num, 0) AS status_num, b.has_urls
+        FROM best b
+        LEFT JOIN status_num s ON s.status = coalesce(b.best_status, 'N/A')
+        ORDER BY b.diseaseId, b.drugId
+    """)
+    con.execute("CREATE INDEX idx_known_drug_summary_pair ON tbl_known_drug_summary (diseaseId, drugId)")
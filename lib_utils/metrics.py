@@ -0,0 +1,160 @@
+"""
+Request instrumentation for the server, enabled with AFFORDABLE_METRICS=1:
+    - named spans inside the handlers:  with span("scoring"): ...
+    - a Server-Timing header with the duration of every span and of the whole request
+    - Prometheus metrics per route (see render_metrics()): latency histogram, requests, DB queries, time per span
+When disabled, span() returns a shared no-op context manager and no middleware is installed.
+Every server process has its own metrics.
+"""
+import os
+import threading
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar
+
+
+METRICS_ENABLED = os.environ.get("AFFORDABLE_METRICS", "0") == "1"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # seconds
+
+_NO_SPAN = nullcontext()
+_current_timing = ContextVar("request_timing", default=None)
+
+
+class RequestTiming:
+    """Spans and DB query count of one request."""
+
+    def __init__(self):
+        self.spans = {}  # span name -> seconds, in order of first use
+        self.db_queries = 0
+
+    def server_timing(self, total: float):
+        """Value of the Server-Timing header (durations in milliseconds)."""
+        entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.spans.items()]
+        entries.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(entries)
+
+
+class _Span:
+    __slots__ = ("timing", "name", "time_start")
+
+    def __init__(self, timing: RequestTiming, name: str):
+        self.timing = timing
+        self.name = name
+
+    def __enter__(self):
+        self.time_start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.timing.spans[self.name] = self.timing.spans.get(self.name, 0.0) + time.perf_counter() - self.time_start
+
+
+def span(name: str):
+    """Times a stage of the current request (no-op outside an instrumented request)."""
+    timing = _current_timing.get()
+    if timing is None:
+        return _NO_SPAN
+    return _Span(timing, name)
+
+
+class InstrumentedCursor:
+    """DuckDB cursor proxy counting the queries of the current request."""
+
+    def __init__(self, cursor, timing: RequestTiming):
+        self._cursor = cursor
+        self._timing = timing
+
+    def execute(self, *args, **kwargs):
+        self._timing.db_queries += 1
+        self._cursor.execute(*args, **kwargs)
+        return self
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def instrument_cursor(cursor):
+    timing = _current_timing.get()
+    return cursor if timing is None else InstrumentedCursor(cursor, timing)
+
+
+class _RouteMetrics:
+    def __init__(self):
+        self.bucket_counts = [0] * len(LATENCY_BUCKETS)
+        self.latency_sum = 0.0
+        self.requests = {}  # status code -> count
+        self.db_queries = 0
+        self.span_seconds = {}  # span name -> seconds
+
+
+_routes = {}  # (method, route) -> _RouteMetrics
+_lock = threading.Lock()
+
+
+def observe(method: str, route: str, status_code: int, seconds: float, timing: RequestTiming):
+    with _lock:
+        metrics = _routes.get((method, route))
+        if metrics is None:
+            metrics = _routes[(method, route)] = _RouteMetrics()
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                metrics.bucket_counts[i] += 1
+        metrics.latency_sum += seconds
+        metrics.requests[status_code] = metrics.requests.get(status_code, 0) + 1
+        metrics.db_queries += timing.db_queries
+        for name, span_seconds in timing.spans.items():
+            metrics.span_seconds[name] = metrics.span_seconds.get(name, 0.0) + span_seconds
+
+
+def render_metrics():
+    """Metrics in the Prometheus text exposition format."""
+    lines = [
+        "# HELP affordable_request_duration_seconds Request latency.",
+        "# TYPE affordable_request_duration_seconds histogram",
+    ]
+    with _lock:
+        routes = sorted(_routes.items())
+        for (method, route), metrics in routes:
+            labels = f'method="{method}",route="{route}"'
+            for bound, count in zip(LATENCY_BUCKETS, metrics.bucket_counts):
+                lines.append(f'affordable_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            total = sum(metrics.requests.values())
+            lines.append(f'affordable_request_duration_seconds_bucket{{{labels},le="+Inf"}} {total}')
+            lines.append(f"affordable_request_duration_seconds_sum{{{labels}}} {metrics.latency_sum}")
+            lines.append(f"affordable_request_duration_seconds_count{{{labels}}} {total}")
+
+        lines += ["# HELP affordable_requests_total Requests by status code.", "# TYPE affordable_requests_total counter"]
+        for (method, route), metrics in routes:
+            for status_code, count in sorted(metrics.requests.items()):
+                lines.append(f'affordable_requests_total{{method="{method}",route="{route}",status="{status_code}"}} {count}')
+
+        lines += ["# HELP affordable_db_queries_total DuckDB queries.", "# TYPE affordable_db_queries_total counter"]
+        for (method, route), metrics in routes:
+            lines.append(f'affordable_db_queries_total{{method="{method}",route="{route}"}} {metrics.db_queries}')
+
+        lines += ["# HELP affordable_span_seconds_total Time spent in the named stages of the handlers.", "# TYPE affordable_span_seconds_total counter"]
+        for (method, route), metrics in routes:
+            for name, seconds in sorted(metrics.span_seconds.items()):
+                lines.append(f'affordable_span_seconds_total{{method="{method}",route="{route}",span="{name}"}} {seconds}')
+    return "\n".join(lines) + "\n"
+
+
+def install_metrics(app):
+    """Adds the timing middleware to the app (only if the metrics are enabled)."""
+    if not METRICS_ENABLED:
+        return
+
+    @app.middleware("http")
+    async def timing_middleware(request, call_next):
+        timing = RequestTiming()
+        token = _current_timing.set(timing)
+        time_start = time.perf_counter()
+        try:
+            response = await call_next(request)
+        finally:
+            _current_timing.reset(token)
+        seconds = time.perf_counter() - time_start
+        route = request.scope.get("route")
+        observe(request.method, route.path if route is not None else "unmatched", response.status_code, seconds, timing)
+        response.headers["Server-Timing"] = timing.server_timing(seconds)
+        return response
@@ -0,0 +1,84 @@
+import json
+import os
+from hashlib import md5
+
+
+FTP_HOST = "ftp.ebi.ac.uk"
+FTP_PLATFORM_DIR = "/pub/databases/opentargets/platform"
+
+DEFAULT_RELEASE = "24.09"
+DEFAULT_DB_PATH = "bio_data.duck.db"  # database file of the default (legacy) release
+DATA_ROOT = "data"
+
+ACTIVE_RELEASE_FILE = "active_release.json"  # pointer to the database the server should use
+
+# environment variables used to pass the release to the pipeline scripts (see 5000_script_runner_contiguous.py)
+ENV_RELEASE = "OT_RELEASE"
+ENV_DB_PATH = "OT_DB_PATH"
+
+
+class ReleaseConfig:
+    """Paths of a single Open Targets release: FTP folders, local data folder and database file."""
+
+    def __init__(self, release: str, data_dir: str = None, db_path: str = None):
+        self.release = release
+        year, month = release.split('.')[:2]
+        # local data folders are named after the release date, e.g. 24.09 -> data/202409XX
+        self.data_dir = data_dir or os.path.join(DATA_ROOT, f"20{year}{month}XX")
+        self.db_path = db_path or f"bio_data.{release}.duck.db"
+
+    def __repr__(self):
+        return f"ReleaseConfig(release={self.release!r}, data_dir={self.data_dir!r}, db_path={self.db_path!r})"
+
+    @property
+    def ftp_release_dir(self):
+        return f"{FTP_PLATFORM_DIR}/{self.release}/"
+
+    @property
+    def checksum_file(self):
+        return os.path.join(self.data_dir, "release_data_integrity")
+
+    def ftp_dir(self, dataset: str, fmt: str = "json"):
+        """Returns the FTP folder of a dataset, e.g. ftp_dir('molecule') or ftp_dir('evidence', 'parquet')."""
+        return f"{self.ftp_release_dir}output/etl/{fmt}/{dataset}/"
+
+    def local_dir(self, dataset: str):
+        return os.path.join(self.data_dir, dataset)
+
+
+def get_release_config():
+    """
+    Returns the release the current process works on.
+    The release is selected with the OT_RELEASE environment variable (e.g. OT_RELEASE=25.03),
+    the database file can be overridden with OT_DB_PATH.
+    The default release keeps the legacy layout (data/202409XX, bio_data.duck.db).
+    """
+    release = os.environ.get(ENV_RELEASE) or DEFAULT_RELEASE
+    db_path = os.environ.get(ENV_DB_PATH)
+    if release == DEFAULT_RELEASE:
+        db_path = db_path or DEFAULT_DB_PATH
+    return ReleaseConfig(release, db_path=db_path)
+
+
+def get_active_db_path(config: ReleaseConfig = None):
+    """Returns the database path of the activated release, or the configured one if no release was activated."""
+    if os.path.exists(ACTIVE_RELEASE_FILE):
+        with open(ACTIVE_RELEASE_FILE, encoding="utf-8") as f:
+            return json.load(f)["db_path"]
+    return (config or get_release_config()).db_path
+
+
+def activate_release(config: ReleaseConfig):
+    """Atomically points the server to the database of the given release."""
+    if not os.path.exists(config.db_path):
+        raise FileNotFoundError(f"database of release {config.release} not found: {config.db_path}")
+    tmp_path = ACTIVE_RELEASE_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"release": config.release, "db_path": config.db_path}, f)
+    os.replace(tmp_path, ACTIVE_RELEASE_FILE)  # atomic on both POSIX and Windows
+
+
+def get_db_fingerprint(db_path: str):
+    """Identifies a build of the database file (changes whenever the file is rewritten)."""
+    stat = os.stat(db_path)
+    return md5(f"{os.path.abspath(db_path)}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8")).hexdigest()[:16]
@@ -0,0 +1,73 @@
+"""
+Streaming responses for large result sets, selected with the Accept header of the request:
+    application/x-ndjson                 one JSON object per line
+    application/vnd.apache.arrow.stream  Arrow IPC stream, record batches of ARROW_BATCH_SIZE rows
+The records are serialized as they are produced, without the validation and encoding of the response model,
+with the serializer of the regular responses (lib_utils/fast_json.py), so both format the numbers the same way.
+"""
+import io
+
+from fastapi.responses import StreamingResponse
+
+from lib_utils.fast_json import dumps
+
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+ARROW_BATCH_SIZE = 64  # rows
+
+
+def get_stream_media_type(accept: str):
+    """Returns the streaming media type requested in the Accept header (the first one listed), None for a regular response."""
+    for media_range in (accept or "").split(","):
+        media_type = media_range.split(";")[0].strip().lower()
+        if media_type in (NDJSON_MEDIA_TYPE, ARROW_MEDIA_TYPE):
+            return media_type
+    return None
+
+
+def to_ndjson_line(obj):
+    return dumps(obj) + b"\n"
+
+
+def iter_ndjson(records):
+    for record in records:
+        yield to_ndjson_line(record)
+
+
+def iter_arrow(records, fields: list, json_columns: tuple = ()):
+    """
+    Yields an Arrow IPC stream of the records.
+    fields: list of (column name, Arrow type alias), e.g. [("Similarity", "double")];
+    the columns in json_columns hold nested values and are sent as JSON strings.
+    """
+    import pyarrow as pa  # only needed for Arrow responses
+
+    schema = pa.schema([(name, pa.type_for_alias(alias)) for name, alias in fields])
+    sink = io.BytesIO()
+    writer = pa.ipc.new_stream(sink, schema)
+
+    def take():
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    batch = []
+    for record in records:
+        batch.append({name: dumps(record.get(name)).decode("utf-8") if name in json_columns else record.get(name) for name, _ in fields})
+        if len(batch) == ARROW_BATCH_SIZE:
+            writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=schema))
+            batch = []
+            yield take()
+    if batch:
+        writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=schema))
+    writer.close()
+    yield take()
+
+
+def streaming_response(records, media_type: str, fields: list = None, json_columns: tuple = ()):
+    """Streams the records as NDJSON or Arrow IPC (fields and json_columns are used for Arrow only, see iter_arrow)."""
+    if media_type == ARROW_MEDIA_TYPE:
+        return StreamingResponse(iter_arrow(records, fields, json_columns), media_type=ARROW_MEDIA_TYPE)
+    return StreamingResponse(iter_ndjson(records), media_type=NDJSON_MEDIA_TYPE)
@@ -0,0 +1,126 @@
+"""
+Trigram search index over the names of the molecules, diseases and targets (built by 0101_dbase_search_index_create.py).
+
+    tbl_search_documents(doc_id, entity, id, field, text, weight)  one row per searchable text, lower case
+    tbl_search_trigrams(trigram, doc_id)                           distinct trigrams of every document, sorted by trigram
+
+A query matches the documents that contain it as a substring (like ILIKE '%query%');
+the trigram table narrows the candidates down to the documents that have all the trigrams of the query.
+The matches are ranked by field weight and match quality: exact > prefix > word prefix > substring, then shorter texts first.
+"""
+
+
+# entity -> (source table, SQL of its documents: id, field, text, weight)
+SEARCH_ENTITIES = {
+    "molecule": ("tbl_molecules", """
+        SELECT id, 'name' AS field, lower(name) AS text, 3.0 AS weight FROM tbl_molecules WHERE name IS NOT NULL
+        UNION ALL
+        SELECT id, 'tradeNames', lower(unnest(tradeNames)), 3.0 FROM tbl_molecules
+        UNION ALL
+        SELECT id, 'synonyms', lower(unnest(synonyms)), 1.0 FROM tbl_molecules
+    """),
+    "disease": ("tbl_diseases", """
+        SELECT id, 'name' AS field, lower(name) AS text, 3.0 AS weight FROM tbl_diseases WHERE name IS NOT NULL
+        UNION ALL
+        SELECT id, 'description', lower(description), 0.5 FROM tbl_diseases WHERE description IS NOT NULL
+    """),
+    "target": ("tbl_targets", """
+        SELECT id, 'approvedName' AS field, lower(approvedName) AS text, 3.0 AS weight FROM tbl_targets WHERE approvedName IS NOT NULL
+        UNION ALL
+        SELECT id, 'approvedSymbol', lower(approvedSymbol), 3.0 FROM tbl_targets WHERE approvedSymbol IS NOT NULL
+    """),
+}
+
+
+class InvalidCursorError(ValueError):
+    """The after id of a page is not a match of the query, e.g. an id of another query or of an older release."""
+
+
+def get_trigrams(text: str):
+    return sorted({text[i:i + 3] for i in range(len(text) - 2)})
+
+
+def build_search_index(con):
+    """(Re)creates the search tables in the database of the connection."""
+    documents = "\nUNION ALL\n".join(
+        f"SELECT '{entity}' AS entity, * FROM ({documents_sql})" for entity, (_, documents_sql) in SEARCH_ENTITIES.items()
+    )
+    con.execute("DROP TABLE IF EXISTS tbl_search_documents")
+    con.execute(f"""
+        CREATE TABLE tbl_search_documents AS
+        SELECT row_number() OVER (ORDER BY entity, id, field, text)::INTEGER AS doc_id, entity, id, field, text, weight::FLOAT AS weight
+        FROM (SELECT DISTINCT * FROM ({documents}) WHERE text <> '')
+    """)
+    con.execute("CREATE INDEX idx_search_documents_doc_id ON tbl_search_documents (doc_id)")
+
+    con.execute("DROP TABLE IF EXISTS tbl_search_trigrams")
+    con.execute("""
+        CREATE TABLE tbl_search_trigrams AS
+        SELECT DISTINCT substr(text, i, 3) AS trigram, doc_id
+        FROM (SELECT doc_id, text, unnest(range(1, length(text) - 1)) AS i FROM tbl_search_documents)
+        ORDER BY trigram, doc_id
+    """)
+    con.execute("CREATE INDEX idx_search_trigrams_trigram ON tbl_search_trigrams (trigram)")
+
+
+def search_ids(conn, entity: str, query: str, limit: int, after: str = None, indexed: bool = True):
+    """
+    Returns the ids of the entities matching the query, best first.
+    Keyset pagination: after is the last id of the previous page (of the same query), the page starts with the next match.
+    Raises InvalidCursorError if after is not a match of the query.
+    Without the index (indexed=False) the documents are generated from the source table and scanned.
+    """
+    q = query.strip().lower()
+    params = [q, q, q]  # match quality
+    if indexed:
+        documents = "SELECT * FROM tbl_search_documents WHERE entity = ?"
+        params.append(entity)
+    else:
+        documents = SEARCH_ENTITIES[entity][1]
+    params.append(q)
+
+    prefilter = ""
+    trigrams = get_trigrams(q)
+    if indexed and trigrams:
+        prefilter = """
+            AND doc_id IN (
+                SELECT doc_id FROM tbl_search_trigrams WHERE trigram IN (SELECT unnest(?::STRING[]))
+                GROUP BY doc_id HAVING count(*) = ?
+            )
+        """
+        params += [trigrams, len(trigrams)]
+
+    keyset = ""
+    if after is not None:
+        # the matches that sort after the match of the given id
+        keyset = """
+            , (SELECT score AS after_score, text_length AS after_length, id AS after_id FROM ranked WHERE id = ?)
+            WHERE score < after_score OR (score = after_score AND (text_length > after_length OR (text_length = after_length AND id > after_id)))
+        """
+        params.append(after)
+
+    ranked = f"""
+        WITH ranked AS (
+            SELECT id,
+                max(weight * CASE
+                    WHEN text = ? THEN 4
+                    WHEN starts_with(text, ?) THEN 3
+                    WHEN contains(' ' || text, ' ' || ?) THEN 2
+                    ELSE 1 END) AS score,
+                min(length(text)) AS text_length
+            FROM ({documents}) d
+            WHERE contains(text, ?) {prefilter}
+            GROUP BY id
+        )
+    """
+    rows = conn.execute(f"""
+        {ranked}
+        SELECT id FROM ranked {keyset}
+        ORDER BY score DESC, text_length, id
+        LIMIT ?
+    """, [*params, limit]).fetchall()
+    # an empty page is the end of the results only if the cursor is a match of the query
+    if after is not None and not rows:
+        if not conn.execute(f"{ranked} SELECT count(*) FROM ranked WHERE id = ?", params).fetchone()[0]:
+            raise InvalidCursorError(f"after={after!r} is not a match of the query {query!r}")
+    return [row[0] for row in rows]
@@ -0,0 +1,402 @@
+"""
+Scoring behind the /disease_chembl_similarity and /evidences endpoints, usable without the server:
+
+    service = SimilarityService(get_active_db_path())
+    result = service.disease_chembl_similarity("EFO_0009854", "CHEMBL395091", top_k=10)
+    evidences = service.evidences("EFO_0009854", "CHEMBL395091", "CHEMBL742")
+    for index, disease_id, chembl_id, result, error in service.disease_chembl_similarity_batch(pairs):
+        ...
+
+The results are the objects the endpoints return as JSON. A missing disease, molecule or target raises NotFoundError
+(404 of the endpoints). The methods borrow a cursor from the pool of the service, or use the one they are given.
+"""
+import logging
+from contextlib import contextmanager
+
+import duckdb
+import numpy as np
+
+from lib_utils.db_pool import DEFAULT_POOL_SIZE, CursorPool
+from lib_utils.known_drugs import NO_KNOWN_DRUG_SUMMARY, summarize_known_drugs
+from lib_utils.metrics import span
+from lib_utils.release_config import get_db_fingerprint
+from lib_utils.result_cache import ResultCache
+from lib_utils.vector_store import get_mask, get_masked_dots, get_masked_norms, get_masked_vectors, open_vector_store
+
+
+class NotFoundError(LookupError):
+    """The disease, the molecule or the targets of a request are not in the database."""
+
+
+class SimilarityService:
+
+    def __init__(self, db_path: str, pool_size: int = DEFAULT_POOL_SIZE, result_cache: ResultCache = None):
+        """
+        db_path: database of a release, its vector store is built on first use (see lib_utils/vector_store.py).
+        result_cache: cache of the disease_chembl_similarity results, e.g. shared by the services of several releases
+        (the keys include the database fingerprint).
+        """
+        self.db_path = db_path
+        self.store = open_vector_store(db_path)
+        self.pool = CursorPool(db_path, pool_size)
+        self.fingerprint = get_db_fingerprint(db_path)
+        self.result_cache = result_cache
+        # masked norms of the diseases, read from tbl_disease_masked_norms (see 0130) or computed on first use
+        self.masked_norms_cache = ResultCache(max_size=1024)
+        self._tables = None
+
+    @contextmanager
+    def _cursor(self, conn: duckdb.DuckDBPyConnection = None):
+        if conn is not None:
+            yield conn
+        else:
+            with self.pool.cursor() as cur:
+                yield cur
+
+    def has_table(self, conn: duckdb.DuckDBPyConnection, table_name: str):
+        """Whether the database has the table, e.g. one created by an optional pipeline stage."""
+        if self._tables is None:
+            self._tables = {row[0] for row in conn.execute("SELECT table_name FROM information_schema.tables").fetchall()}
+        return table_name in self._tables
+
+    # ---------------------- /disease_chembl_similarity ----------------------
+
+    def disease_chembl_similarity(self, disease_id: str, chembl_id: str, top_k: int = 10, conn: duckdb.DuckDBPyConnection = None,
+                                  include_descendants: bool = False):
+        """
+        Returns the top-k similar substances for the disease and the reference molecule (reference_drug, similar_drugs_primary/secondary).
+        include_descendants: the targets of the disease and of all its subtypes are scored (see get_disease_target_columns()).
+        """
+        # the keys of the default mode are the ones of disease_chembl_similarity_batch()
+        cache_key = (self.fingerprint, disease_id, chembl_id, top_k) + (("include_descendants",) if include_descendants else ())
+        if self.result_cache is not None:
+            with span("cache"):
+                result = self.result_cache.get(cache_key)
+            if result is not None:
+                return result
+
+        with self._cursor(conn) as conn:
+            # Target columns of the disease and the reference vector, both from the memory-mapped vector store
+            columns = self.get_disease_target_columns(conn, disease_id, include_descendants)
+            if columns is None:
+                raise NotFoundError("No targets found for this disease")
+
+            ref_row = self.store.row_index.get(chembl_id)
+            if ref_row is None:
+                raise NotFoundError("ChEMBL ID not found in dataset")
+
+            similarities = self.score_disease_similarities(conn, disease_id, columns, [ref_row], include_descendants)[0]
+            with span("ranking"):
+                result = self.rank_disease_similarities(conn, disease_id, chembl_id, top_k, similarities)
+        if self.result_cache is not None:
+            self.result_cache.put(cache_key, result)
+        return result
+
+    def disease_chembl_similarity_batch(self, pairs: list, top_k: int = 10, conn: duckdb.DuckDBPyConnection = None):
+        """
+        Scores many (disease_id, chembl_id) pairs, yields (index, disease_id, chembl_id, result, error) for every pair,
+        with either the result of disease_chembl_similarity() or the exception it would raise.
+        The pairs are grouped by disease, so the mask and the candidates of a disease are computed once.
+        """
+        pairs_by_disease = {}
+        for index, (disease_id, chembl_id) in enumerate(pairs):
+            pairs_by_disease.setdefault(disease_id, []).append((index, chembl_id))
+
+        with self._cursor(conn) as conn:
+            for disease_id, disease_pairs in pairs_by_disease.items():
+                pending = []
+                for index, chembl_id in disease_pairs:
+                    result = self.result_cache.get((self.fingerprint, disease_id, chembl_id, top_k)) if self.result_cache is not None else None
+                    if result is not None:
+                        yield index, disease_id, chembl_id, result, None
+                    else:
+                        pending.append((index, chembl_id))
+                if not pending:
+                    continue
+
+                columns = self.store.get_disease_columns(disease_id)
+                ref_rows = {}
+                for index, chembl_id in pending:
+                    if columns is None:
+                        yield index, disease_id, chembl_id, None, NotFoundError("No targets found for this disease")
+                    elif chembl_id not in self.store.row_index:
+                        yield index, disease_id, chembl_id, None, NotFoundError("ChEMBL ID not found in dataset")
+                    else:
+                        ref_rows.setdefault(chembl_id, self.store.row_index[chembl_id])
+                if not ref_rows:
+                    continue
+
+                all_similarities = self.score_disease_similarities(conn, disease_id, columns, list(ref_rows.values()))
+                similarities_by_chembl_id = dict(zip(ref_rows, all_similarities))
+                for index, chembl_id in pending:
+                    if chembl_id not in similarities_by_chembl_id:
+                        continue
+                    try:
+                        result = self.rank_disease_similarities(conn, disease_id, chembl_id, top_k, similarities_by_chembl_id[chembl_id])
+                    except Exception as e:
+                        # the same pair fails on disease_chembl_similarity(), e.g. no positive similarity of the reference to itself
+                        logging.exception(f"batch similarity failed for {disease_id} - {chembl_id}")
+                        yield index, disease_id, chembl_id, None, e
+                        continue
+                    if self.result_cache is not None:
+                        self.result_cache.put((self.fingerprint, disease_id, chembl_id, top_k), result)
+                    yield index, disease_id, chembl_id, result, None
+
+    def get_disease_target_columns(self, conn: duckdb.DuckDBPyConnection, disease_id: str, include_descendants: bool = False):
+        """
+        Returns the vector columns (ascending) of the targets of the disease, None if it has none.
+        With include_descendants, the targets of the disease and of all its descendants, read from tbl_disease_descendant_target
+        (see 0160) or, if it has not been built, from the descendants listed in tbl_diseases.
+        """
+        if not include_descendants:
+            return self.store.get_disease_columns(disease_id)
+        if self.has_table(conn, "tbl_disease_descendant_target"):
+            query = "SELECT target_id FROM tbl_disease_descendant_target WHERE disease_id = ?"
+            params = [disease_id]
+        else:
+            query = """
+                SELECT DISTINCT target_id FROM tbl_disease_target
+                WHERE disease_id = ? OR disease_id IN (SELECT unnest(descendants) FROM tbl_diseases WHERE id = ?)
+            """
+            params = [disease_id, disease_id]
+        feature_index = self.store.feature_index
+        columns = sorted({feature_index[target_id] for target_id, in conn.execute(query, params).fetchall() if target_id in feature_index})
+        return np.array(columns, dtype=np.int32) if columns else None
+
+    def get_disease_masked_norms(self, conn: duckdb.DuckDBPyConnection, disease_id: str, columns: np.ndarray, include_descendants: bool = False):
+        """
+        Returns the rows of the molecules that have at least one target of the disease (ascending) and their masked norms.
+        The norms are read from tbl_disease_masked_norms if the disease was precomputed, otherwise computed from the vector store.
+        """
+        cache_key = (disease_id, "include_descendants") if include_descendants else disease_id
+        cached = self.masked_norms_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        store = self.store
+        rows = None
+        # the precomputed norms are the ones of the targets of the disease only
+        if not include_descendants and self.has_table(conn, "tbl_disease_masked_norms"):
+            stored = conn.execute("SELECT ChEMBL_id, norm FROM tbl_disease_masked_norms WHERE disease_id = ?", [disease_id]).fetchnumpy()
+            if len(stored["ChEMBL_id"]):
+                rows = np.array([store.row_index[chembl_id] for chembl_id in stored["ChEMBL_id"]], dtype=np.int64)
+                norms = np.asarray(stored["norm"], dtype=np.float32)
+                order = np.argsort(rows)
+                rows, norms = rows[order], norms[order]
+        if rows is None:
+            # lazy fill: the disease is not precomputed, only the rows with a value in the masked columns can have a non-zero norm
+            rows = store.get_candidate_rows(columns)
+            norms = get_masked_norms(store.matrix, rows, get_mask(store.matrix.shape[1], columns))
+            rows, norms = rows[norms > 0], norms[norms > 0]
+
+        self.masked_norms_cache.put(cache_key, (rows, norms))
+        return rows, norms
+
+    def score_disease_similarities(self, conn: duckdb.DuckDBPyConnection, disease_id: str, columns: np.ndarray, ref_rows: list,
+                                   include_descendants: bool = False):
+        """
+        Returns, for every reference row, the list of molecules with a positive similarity to it (in the order of the vector store).
+        All the references of the disease are scored at once over the union of their candidates (see get_masked_dots()).
+        """
+        store = self.store
+        with span("masked_norms"):
+            rows, norms = self.get_disease_masked_norms(conn, disease_id, columns, include_descendants)
+        mask = get_mask(store.matrix.shape[1], columns)
+        vecs_ref = get_masked_vectors(store.matrix, np.asarray(ref_rows), mask)
+
+        # a molecule can only be similar if it hits a disease target that the reference also hits:
+        # the union of the postings of these targets is the exact candidate set (the dot products of the others are 0)
+        with span("candidates"):
+            candidate_rows = store.get_candidate_rows(columns[np.any(vecs_ref[:, columns] != 0, axis=0)])
+            candidate_rows = candidate_rows[np.isin(candidate_rows, rows, assume_unique=True)]  # rows with a zero masked norm
+            candidate_norms = norms[np.searchsorted(rows, candidate_rows)]
+        with span("scoring"):
+            # same arithmetic as the original endpoint: float32 dot products of the full-length masked vectors
+            all_dots = get_masked_dots(store.matrix, candidate_rows, mask, vecs_ref)
+
+        results = []
+        for j, vec_ref in enumerate(vecs_ref):
+            vec_ref_norm = np.linalg.norm(vec_ref)
+
+            # only molecules with a positive dot product can have a positive similarity
+            dots = all_dots[:, j]
+            candidates = np.flatnonzero(dots > 0)
+
+            similarities = []
+            for i, dot, candidate_norm in zip(candidate_rows[candidates], dots[candidates], candidate_norms[candidates]):
+                norm_product = vec_ref_norm * candidate_norm
+                similarity = dot / (norm_product + 0) if norm_product > 0 else 0  # Avoid division by zero
+                similarity = float(similarity)  # Convert to float for JSON serialization
+                similarity = round(similarity, 6)
+
+                if similarity > 0:
+                    similarities.append({"ChEMBL ID": str(store.chembl_ids[i]), "Similarity": similarity})
+            results.append(similarities)
+        return results
+
+    def get_known_drugs(self, conn: duckdb.DuckDBPyConnection, disease_id: str, chembl_ids: list):
+        """Returns the tbl_knownDrugsAggregated rows (dicts, in table order) of the disease by drug."""
+        query = "SELECT * FROM tbl_knownDrugsAggregated WHERE diseaseId = ? AND drugId IN (SELECT unnest(?::STRING[])) ORDER BY rowid"
+        rows = conn.execute(query, [disease_id, chembl_ids]).fetchall()
+        columns = [column[0] for column in conn.description]
+        known_drugs = {}
+        for row in rows:
+            row = dict(zip(columns, row))
+            known_drugs.setdefault(row['drugId'], []).append(row)
+        return known_drugs
+
+    def get_known_drug_summaries(self, conn: duckdb.DuckDBPyConnection, disease_id: str, chembl_ids: list, known_drugs: dict):
+        """Returns (max_phase, best_status, status_num, has_urls) by drug, from tbl_known_drug_summary (see 0105) if it exists."""
+        if not self.has_table(conn, "tbl_known_drug_summary"):
+            return {chembl_id: summarize_known_drugs(rows) for chembl_id, rows in known_drugs.items()}
+        query = """
+            SELECT drugId, max_phase, best_status, status_num, has_urls FROM tbl_known_drug_summary
+            WHERE diseaseId = ? AND drugId IN (SELECT unnest(?::STRING[]))
+        """
+        return {row[0]: row[1:] for row in conn.execute(query, [disease_id, chembl_ids]).fetchall()}
+
+    def rank_disease_similarities(self, conn: duckdb.DuckDBPyConnection, disease_id: str, chembl_id: str, top_k: int, similarities: list):
+        """Adds the known drug data to the similar molecules and ranks them into the disease_chembl_similarity() result."""
+        # Sort results by similarity
+        ranked_results = sorted(similarities, key=lambda x: x["Similarity"], reverse=True)
+
+        # known drug data and names of all the similar molecules, fetched at once
+        chembl_ids = [row['ChEMBL ID'] for row in ranked_results]
+        with span("known_drugs"):
+            known_drugs = self.get_known_drugs(conn, disease_id, chembl_ids)
+            summaries = self.get_known_drug_summaries(conn, disease_id, chembl_ids, known_drugs)
+        with span("substances"):
+            query = "SELECT chembl_id, COALESCE(name, 'N/A'), isApproved FROM tbl_substances WHERE chembl_id IN (SELECT unnest(?::STRING[]))"
+            substances = {chembl_id1: (molecule_name, is_approved) for chembl_id1, molecule_name, is_approved in conn.execute(query, [chembl_ids]).fetchall()}
+
+        for i, row in enumerate(ranked_results):
+            chembl_id1 = row['ChEMBL ID']
+            molecule_name, is_approved = substances[chembl_id1]
+            max_phase, max_status_for_max_phase, status_num, is_url_available = summaries.get(chembl_id1, NO_KNOWN_DRUG_SUMMARY)
+
+            ranked_results[i]['fld_knownDrugsAggregated'] = known_drugs.get(chembl_id1, [])
+            ranked_results[i]['Molecule Name'] = molecule_name
+            ranked_results[i]['isUrlAvailable'] = is_url_available
+            ranked_results[i]['isApproved'] = is_approved
+            ranked_results[i]['phase'] = max_phase
+            ranked_results[i]['status'] = max_status_for_max_phase
+            ranked_results[i]['status_num'] = status_num
+
+        reference_drug = next(row for row in ranked_results if row['ChEMBL ID'] == chembl_id)
+
+        # ------------ isApproved OR isUrlAvailable ------------------
+        results_top_k_lvl1 = [row for row in ranked_results if (row['isUrlAvailable'] or row['isApproved']) and row['ChEMBL ID'] != chembl_id]
+        results_top_k_lvl1.sort(key=lambda x: [x['Similarity'], x['isApproved'], x['isUrlAvailable'], x['phase'], x['status_num'], x['ChEMBL ID']], reverse=True)
+
+        if len(results_top_k_lvl1) > top_k - 1:
+            ref_similarity = results_top_k_lvl1[top_k - 1]["Similarity"]
+            results_top_k_lvl1 = [row for row in results_top_k_lvl1 if row['Similarity'] >= ref_similarity]
+
+        # ------------ not isApproved AND not isUrlAvailable ------------------
+        results_top_k_lvl2 = [row for row in ranked_results if not row['isUrlAvailable'] and not row['isApproved'] and row['ChEMBL ID'] != chembl_id]
+        results_top_k_lvl2.sort(key=lambda x: [x['Similarity'], x['phase'], x['status_num'], x['ChEMBL ID']], reverse=True)
+
+        if len(results_top_k_lvl2) > top_k - 1:
+            ref_similarity = results_top_k_lvl2[top_k - 1]["Similarity"]
+            results_top_k_lvl2 = [row for row in results_top_k_lvl2 if row['Similarity'] >= ref_similarity]
+
+        return {'reference_drug': reference_drug, 'similar_drugs_primary': results_top_k_lvl1, 'similar_drugs_secondary': results_top_k_lvl2}
+
+    # ---------------------- disease prevalence ----------------------
+
+    def disease_prevalences(self, disease_ids: list, conn: duckdb.DuckDBPyConnection = None):
+        """
+        Returns the Orphanet prevalence of the diseases that have one (tbl_disease_prevalence, see 0150):
+        disease_id -> {'orpha_code', 'prevalence' (per 100 000), 'population', 'is_worldwide'}.
+        """
+        with self._cursor(conn) as conn:
+            if not self.has_table(conn, "tbl_disease_prevalence"):
+                return {}
+            rows = conn.execute(
+                "SELECT disease_id, orpha_code, prevalence, population, is_worldwide FROM tbl_disease_prevalence "
+                "WHERE disease_id IN (SELECT unnest(?::STRING[]))", [list(disease_ids)]
+            ).fetchall()
+        return {
+            disease_id: {'orpha_code': orpha_code, 'prevalence': prevalence, 'population': population, 'is_worldwide': is_worldwide}
+            for disease_id, orpha_code, prevalence, population, is_worldwide in rows
+        }
+
+    # ---------------------- /evidences ----------------------
+
+    def evidences(self, disease_id: str, reference_drug_id: str, replacement_drug_id: str, conn: duckdb.DuckDBPyConnection = None):
+        """
+        Returns the actions of the replacement drug on the disease targets hit by the reference drug, with their references,
+        the identified actions first.
+        """
+        with self._cursor(conn) as conn, span("evidences"):
+            if self.has_table(conn, "tbl_evidences"):
+                res = self.get_compiled_evidences(conn, disease_id, reference_drug_id, replacement_drug_id)
+            else:
+                res = self.get_action_evidences(conn, disease_id, reference_drug_id, replacement_drug_id)
+
+        return sorted(res, key=lambda x: (x['action_type'] == 'UNIDENTIFIED', x['target_id']))
+
+    def get_compiled_evidences(self, conn: duckdb.DuckDBPyConnection, disease_id: str, reference_drug_id: str, replacement_drug_id: str):
+        """Evidences read from tbl_evidences (see 0140): one probe per drug, restricted to the disease targets of the reference drug."""
+        q = '''
+        WITH targets AS (
+            SELECT DISTINCT target_id FROM tbl_evidences
+            WHERE ChEMBL_id = ? AND target_id IN (SELECT target_id FROM tbl_disease_target WHERE disease_id = ?)
+        )
+        SELECT t.target_id, e.actionType, e.mechanismOfAction, e.refs, e.action_order IS NOT NULL
+        FROM targets t
+        LEFT JOIN tbl_evidences e ON e.ChEMBL_id = ? AND e.target_id = t.target_id
+        ORDER BY e.action_order
+        '''
+        rows = conn.execute(q, [reference_drug_id, disease_id, replacement_drug_id]).fetchall()
+
+        if not rows:
+            raise NotFoundError("No targets found for this disease")
+
+        return [
+            {'target_id': target_id, 'action_type': action_type, 'mechanism_of_action': mechanism_of_action, 'refs': refs or []}
+            for target_id, action_type, mechanism_of_action, refs, has_evidence in rows if has_evidence
+        ]
+
+    def get_action_evidences(self, conn: duckdb.DuckDBPyConnection, disease_id: str, reference_drug_id: str, replacement_drug_id: str):
+        """Evidences grouped from tbl_actions and tbl_refs, used when tbl_evidences has not been compiled."""
+        q = f'''
+        SELECT DISTINCT a.target_id
+        FROM tbl_disease_target dt
+        JOIN tbl_actions a ON dt.target_id = a.target_id
+        WHERE dt.disease_id = ? AND a.ChEMBL_id = ?
+        '''
+        target_ids = conn.execute(q, [disease_id, reference_drug_id]).fetchall()
+
+        if not target_ids:
+            raise NotFoundError("No targets found for this disease")
+
+        target_ids = [row[0] for row in target_ids]
+
+        placeholders = ','.join(['?']*len(target_ids))
+        q = f'''
+        SELECT a.target_id,
+            a.actionType,
+            a.mechanismOfAction,
+            r.ref_source,
+            r.ref_data
+        FROM tbl_actions a
+        LEFT JOIN tbl_refs r ON a.action_id = r.action_id
+        WHERE a.ChEMBL_id = ? AND a.target_id IN ({placeholders})
+        '''
+        rows = conn.execute(q, [replacement_drug_id, *target_ids]).fetchall()
+
+        res = {}
+        for target_id, action_type, mechanism_of_action, ref_source, ref_data in rows:
+            k = (target_id, action_type, mechanism_of_action)
+            if k not in res:
+                res[k] = {
+                    'target_id': target_id,
+                    'action_type': action_type,
+                    'mechanism_of_action': mechanism_of_action,
+                    'refs': []
+                }
+            if ref_source:
+                res[k]['refs'].append({'ref_source': ref_source, 'ref_data': ref_data})
+
+        return list(res.values())
@@ -0,0 +1,211 @@
+"""
+Memory-mapped copy of tbl_vector_array for the server.
+
+The store is a folder next to the database (bio_data.duck.db -> bio_data.vectors/) with one subfolder per database build
+and store version (<fingerprint>.v<STORE_VERSION>):
+    matrix.npy           float32 [molecules x targets], the rows of tbl_vector_array
+    chembl_ids.npy       row labels
+    features.npy         column labels (target ids)
+    disease_ids.npy      sorted disease ids
+    disease_offsets.npy  disease_columns[disease_offsets[i]:disease_offsets[i + 1]] are the target columns of disease_ids[i]
+    disease_columns.npy
+    target_offsets.npy   inverted index: target_rows[target_offsets[j]:target_offsets[j + 1]] are the rows with a non-zero value in column j
+    target_rows.npy
+The arrays are opened with mmap_mode='r', so all server processes share one copy in the page cache.
+"""
+import json
+import os
+import shutil
+import time
+
+import duckdb
+import numpy as np
+
+from lib_utils.release_config import get_db_fingerprint
+
+
+BATCH_SIZE = 1000  # rows
+MASKED_BLOCK_ROWS = 1024  # rows of a block of full-length masked vectors (rows x features float32)
+STORE_VERSION = 2  # increment when the layout of the store changes, older stores are rebuilt
+
+
+def get_vector_store_dir(db_path: str):
+    return db_path.replace(".duck.db", "") + ".vectors"
+
+
+def _get_build_dir(db_path: str):
+    # the version is part of the name: a store of an older layout is never mistaken for the current one
+    return os.path.join(get_vector_store_dir(db_path), f"{get_db_fingerprint(db_path)}.v{STORE_VERSION}")
+
+
+def is_vector_store_stale(db_path: str):
+    meta_path = os.path.join(_get_build_dir(db_path), "meta.json")
+    if not os.path.exists(meta_path):
+        return True
+    with open(meta_path, encoding="utf-8") as f:
+        return json.load(f).get("version") != STORE_VERSION
+
+
+def build_vector_store(db_path: str):
+    """Writes the vector store of the database unless it is up to date. Returns the folder of the store."""
+    build_dir = _get_build_dir(db_path)
+    if not is_vector_store_stale(db_path):
+        return build_dir
+
+    time_start = time.perf_counter()
+    store_dir = get_vector_store_dir(db_path)
+    tmp_dir = f"{build_dir}.tmp-{os.getpid()}"
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    con = duckdb.connect(db_path, read_only=True)
+    total = con.execute("SELECT count(*) FROM tbl_vector_array").fetchone()[0]
+    cursor = con.execute("SELECT * FROM tbl_vector_array")
+    features = [column[0] for column in cursor.description[1:]]
+
+    matrix = np.lib.format.open_memmap(os.path.join(tmp_dir, "matrix.npy"), mode="w+", dtype=np.float32, shape=(total, len(features)))
+    chembl_ids = []
+    nonzero_rows, nonzero_columns = [], []
+    while True:
+        rows = cursor.fetchmany(BATCH_SIZE)
+        if not rows:
+            break
+        batch = np.array([row[1:] for row in rows], dtype=np.float32)
+        matrix[len(chembl_ids):len(chembl_ids) + len(rows)] = batch
+        batch_rows, batch_columns = np.nonzero(batch)
+        nonzero_rows.append(batch_rows + len(chembl_ids))
+        nonzero_columns.append(batch_columns)
+        chembl_ids.extend(row[0] for row in rows)
+    matrix.flush()
+    del matrix
+
+    # inverted index target -> molecules, the rows of every target stay in ascending order
+    nonzero_rows = np.concatenate(nonzero_rows) if nonzero_rows else np.empty(0, dtype=np.int64)
+    nonzero_columns = np.concatenate(nonzero_columns) if nonzero_columns else np.empty(0, dtype=np.int64)
+    order = np.argsort(nonzero_columns, kind="stable")
+    target_rows = nonzero_rows[order].astype(np.int32)
+    target_offsets = np.zeros(len(features) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(nonzero_columns, minlength=len(features)), out=target_offsets[1:])
+
+    feature_index = {feature: i for i, feature in enumerate(features)}
+    disease_ids, disease_offsets, disease_columns = [], [0], []
+    rows = con.execute("SELECT DISTINCT disease_id, target_id FROM tbl_disease_target ORDER BY disease_id, target_id").fetchall()
+    con.close()
+    for disease_id, target_id in rows:
+        if not disease_ids or disease_ids[-1] != disease_id:
+            disease_ids.append(disease_id)
+            disease_offsets.append(disease_offsets[-1])
+        if target_id in feature_index:
+            disease_columns.append(feature_index[target_id])
+            disease_offsets[-1] += 1
+    # the columns of every disease are sorted to keep the order of the vector features
+    disease_columns = np.array(disease_columns, dtype=np.int32)
+    for i in range(len(disease_ids)):
+        disease_columns[disease_offsets[i]:disease_offsets[i + 1]].sort()
+
+    np.save(os.path.join(tmp_dir, "chembl_ids.npy"), np.array(chembl_ids, dtype=str))
+    np.save(os.path.join(tmp_dir, "features.npy"), np.array(features, dtype=str))
+    np.save(os.path.join(tmp_dir, "disease_ids.npy"), np.array(disease_ids, dtype=str))
+    np.save(os.path.join(tmp_dir, "disease_offsets.npy"), np.array(disease_offsets, dtype=np.int64))
+    np.save(os.path.join(tmp_dir, "disease_columns.npy"), disease_columns)
+    np.save(os.path.join(tmp_dir, "target_offsets.npy"), target_offsets)
+    np.save(os.path.join(tmp_dir, "target_rows.npy"), target_rows)
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"version": STORE_VERSION, "db_path": db_path, "molecules": len(chembl_ids), "features": len(features), "diseases": len(disease_ids)}, f)
+
+    try:
+        os.rename(tmp_dir, build_dir)  # atomic: other processes see either no store or a complete one
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if is_vector_store_stale(db_path):  # the existing folder is not a store built concurrently by another process
+            raise
+
+    # remove the stores of previous builds, processes that still map them keep their copy until they exit
+    for name in os.listdir(store_dir):
+        if name != os.path.basename(build_dir) and ".tmp-" not in name:
+            shutil.rmtree(os.path.join(store_dir, name), ignore_errors=True)
+
+    print(f"✅ Vector store {build_dir} built in {time.perf_counter() - time_start:.1f}s")
+    return build_dir
+
+
+def get_mask(n_features: int, columns: np.ndarray):
+    """Returns the float32 mask of the columns (1: kept, 0: masked), as applied by the server to the vectors."""
+    mask = np.zeros(n_features, dtype=np.float32)
+    mask[columns] = 1
+    return mask
+
+
+def get_masked_vectors(matrix: np.ndarray, rows: np.ndarray, mask: np.ndarray):
+    """
+    Returns the block [len(rows) x features] of the full-length float32 vectors of the rows times the mask.
+    The dot products and norms are computed on these vectors, as the original full-scan endpoint did:
+    a float32 sum is rounded in the order BLAS adds its terms, which depends on their positions in the vector,
+    so computing them on the projections on the masked columns moves the last bits of the similarities
+    and flips their 6th decimal.
+    """
+    return np.asarray(matrix[rows]) * mask
+
+
+def get_masked_norms(matrix: np.ndarray, rows: np.ndarray, mask: np.ndarray):
+    """
+    Returns ||v * mask|| (float32) of the rows of the matrix, computed by blocks of MASKED_BLOCK_ROWS masked vectors.
+    np.linalg.norm of a vector is the square root of the BLAS dot product of the vector with itself, and np.matmul
+    of a stack of (1 x n) @ (n x 1) computes every v . v with that same dot product, so the norms are bit-identical
+    to the ones of the original endpoint (np.linalg.norm(axis=1) and np.einsum add the squares in other orders).
+    Used by both the precompute stage (0130) and the server, so that the stored and the computed norms are identical.
+    """
+    norms = np.empty(len(rows), dtype=np.float32)
+    for start in range(0, len(rows), MASKED_BLOCK_ROWS):
+        vectors = get_masked_vectors(matrix, rows[start:start + MASKED_BLOCK_ROWS], mask)
+        norms[start:start + len(vectors)] = np.sqrt(np.matmul(vectors[:, None, :], vectors[:, :, None])[:, 0, 0])
+    return norms
+
+
+def get_masked_dots(matrix: np.ndarray, rows: np.ndarray, mask: np.ndarray, vecs_ref: np.ndarray):
+    """
+    Returns the float32 dot products [len(rows) x len(vecs_ref)] of the masked vectors of the rows with the masked reference vectors,
+    computed by blocks of MASKED_BLOCK_ROWS masked vectors, all the references at once.
+    np.matmul of a stack of (1 x n) @ (n x 1) computes every product with the BLAS dot product of np.dot of the original endpoint,
+    so the products are bit-identical; a matrix-matrix or matrix-vector product (sgemm, sgemv) adds the terms in another order.
+    """
+    dots = np.empty((len(rows), len(vecs_ref)), dtype=np.float32)
+    for start in range(0, len(rows), MASKED_BLOCK_ROWS):
+        vectors = get_masked_vectors(matrix, rows[start:start + MASKED_BLOCK_ROWS], mask)
+        dots[start:start + len(vectors)] = np.matmul(vectors[:, None, None, :], vecs_ref[None, :, :, None])[:, :, 0, 0]
+    return dots
+
+
+class VectorStore:
+    """Read-only view of a vector store built by build_vector_store()."""
+
+    def __init__(self, build_dir: str):
+        self.build_dir = build_dir
+        self.matrix = np.load(os.path.join(build_dir, "matrix.npy"), mmap_mode="r")
+        self.chembl_ids = np.load(os.path.join(build_dir, "chembl_ids.npy"), mmap_mode="r")
+        self.features = np.load(os.path.join(build_dir, "features.npy"), mmap_mode="r")
+        self.disease_ids = np.load(os.path.join(build_dir, "disease_ids.npy"), mmap_mode="r")
+        self.disease_offsets = np.load(os.path.join(build_dir, "disease_offsets.npy"), mmap_mode="r")
+        self.disease_columns = np.load(os.path.join(build_dir, "disease_columns.npy"), mmap_mode="r")
+        self.target_offsets = np.load(os.path.join(build_dir, "target_offsets.npy"), mmap_mode="r")
+        self.target_rows = np.load(os.path.join(build_dir, "target_rows.npy"), mmap_mode="r")
+        self.row_index = {chembl_id: i for i, chembl_id in enumerate(self.chembl_ids.tolist())}
+        self.feature_index = {target_id: j for j, target_id in enumerate(self.features.tolist())}
+
+    def get_disease_columns(self, disease_id: str):
+        """Returns the indices of the vector features that are targets of the disease, None if the disease has no targets."""
+        i = int(np.searchsorted(self.disease_ids, disease_id))
+        if i == len(self.disease_ids) or self.disease_ids[i] != disease_id:
+            return None
+        return np.asarray(self.disease_columns[self.disease_offsets[i]:self.disease_offsets[i + 1]])
+
+    def get_candidate_rows(self, columns: np.ndarray):
+        """Returns the rows (ascending) with a non-zero value in at least one of the columns, i.e. the union of their postings."""
+        postings = [self.target_rows[self.target_offsets[j]:self.target_offsets[j + 1]] for j in columns]
+        if not postings:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(postings)).astype(np.int64)
+
+
+def open_vector_store(db_path: str):
+    """Maps the vector store of the database, building it first if it is missing or stale."""
+    return VectorStore(build_vector_store(db_path))
@@ -0,0 +1,46 @@
+"""
+Warm-up of the server structures, so that the first requests do not pay for cold pages:
+the memory-mapped vector store is read once (page cache) and the hot tables are scanned once (DuckDB buffer pool).
+"""
+import time
+
+import duckdb
+import numpy as np
+
+
+# tables read by the similarity and evidences endpoints, the missing ones are skipped
+WARM_UP_TABLES = [
+    "tbl_disease_masked_norms",
+    "tbl_known_drug_summary",
+    "tbl_knownDrugsAggregated",
+    "tbl_substances",
+    "tbl_evidences",
+    "tbl_disease_target",
+]
+CHUNK_ROWS = 4096  # rows of the vector matrix read at once
+
+
+def _touch(array: np.ndarray):
+    for start in range(0, len(array), CHUNK_ROWS):
+        np.add.reduce(array[start:start + CHUNK_ROWS], axis=None)
+
+
+def warm_up(store, conn: duckdb.DuckDBPyConnection, tables: list = WARM_UP_TABLES):
+    """Reads the vector store and the tables, returns the time of every step in seconds."""
+    timings = {}
+
+    def step(name, fn):
+        time_start = time.perf_counter()
+        fn()
+        timings[name] = round(time.perf_counter() - time_start, 3)
+
+    step("vectors", lambda: _touch(store.matrix))
+    step("id_index", lambda: (_touch(store.chembl_ids.view(np.uint8)), _touch(store.target_offsets), _touch(store.target_rows)))
+    step("mask_index", lambda: (_touch(store.disease_ids.view(np.uint8)), _touch(store.disease_offsets), _touch(store.disease_columns)))
+
+    existing = {row[0] for row in conn.execute("SELECT table_name FROM information_schema.tables").fetchall()}
+    for table in tables:
+        if table in existing:
+            # max() of every column reads all the column segments of the table
+            step(table, lambda: conn.execute(f"SELECT max(COLUMNS(*)) FROM {table}").fetchall())
+    return timings